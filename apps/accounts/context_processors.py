@@ -1,15 +1,34 @@
-from apps.products.models import Cart, CartItem, Wishlist
-
-def cart_items_count(request):
-    count = 0
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        count = CartItem.objects.filter(cart=cart).count()
-    return {'cart_items_count': count}
-
-def wishlist_items_count(request):
-    count = 0
-    if request.user.is_authenticated:
-        wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-        count = wishlist.products.count()
-    return {'wishlist_items_count': count}
+from django.utils.functional import SimpleLazyObject
+
+from apps.products.membership import get_membership
+from apps.products.cart import anonymous_carts_enabled, get_anonymous_cart
+from apps.notifications.unread import get_unread_count
+
+
+def header_summary(request):
+    """
+    Данные шапки сайта: количество товаров в корзине и избранном, непрочитанные уведомления,
+    множества id товаров для карточек. Все значения ленивые и берутся из кэша пользователя;
+    строки корзины и списка желаний при чтении не создаются.
+    """
+    if not request.user.is_authenticated:
+        anonymous_cart = SimpleLazyObject(
+            lambda: frozenset(get_anonymous_cart(request)) if anonymous_carts_enabled() else frozenset()
+        )
+        return {
+            'cart_items_count': SimpleLazyObject(lambda: len(anonymous_cart)),
+            'wishlist_items_count': 0,
+            'unread_notifications_count': 0,
+            'cart_product_ids': anonymous_cart,
+            'wishlist_product_ids': frozenset(),
+        }
+
+    membership = get_membership(request)
+    user_id = request.user.pk
+    return {
+        'cart_items_count': SimpleLazyObject(lambda: len(membership['cart'])),
+        'wishlist_items_count': SimpleLazyObject(lambda: len(membership['wishlist'])),
+        'unread_notifications_count': SimpleLazyObject(lambda: get_unread_count(user_id)),
+        'cart_product_ids': membership['cart'],
+        'wishlist_product_ids': membership['wishlist'],
+    }
@@ -1,5 +1,4 @@
-from django.utils import timezone
-from datetime import timedelta
+from .presence import touch
 
 class UserActivityMiddleware:
     def __init__(self, get_response):
@@ -9,15 +8,7 @@ class UserActivityMiddleware:
         response = self.get_response(request)
         
         if request.user.is_authenticated:
-            # Обновляем время последней активности
-            current_time = timezone.now()
-            
-            # Если последняя активность более 5 минут назад,
-            # считаем пользователя вышедшим из сети и снова вошедшим
-            if current_time - request.user.last_activity > timedelta(minutes=5):
-                request.user.is_online = True
-                
-            request.user.last_activity = current_time
-            request.user.save(update_fields=['last_activity', 'is_online'])
+            # Отметка активности; запись в базу не чаще раза в несколько минут
+            touch(request.user)
         
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import redis
+from django.contrib.auth import get_user_model
+from django.db.models import Case, DateTimeField, When
+from django.utils import timezone
+
+from apps.user_activities.store import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Пользователь "в сети", если был активен за это время
+ONLINE_WINDOW = timedelta(minutes=5)
+# Не чаще одной записи last_activity в базу на пользователя за этот интервал (секунды)
+WRITE_INTERVAL = 2 * 60
+# Сколько хранить отметки в быстром хранилище
+RETENTION = 24 * 60 * 60
+RECONCILE_BATCH_SIZE = 500
+
+LAST_SEEN_KEY = 'presence:last_seen'
+
+# Без Redis - отметки последней записи в памяти процесса
+_local_lock = threading.Lock()
+_local_written = {}
+
+
+def _write_key(user_id):
+    return f'presence:written:{user_id}'
+
+
+def _should_write_local(user_id, now):
+    with _local_lock:
+        written_at = _local_written.get(user_id)
+        if written_at is not None and now - written_at < WRITE_INTERVAL:
+            return False
+        _local_written[user_id] = now
+        return True
+
+
+def touch(user):
+    """
+    Отметка активности пользователя: время в быстром хранилище при каждом запросе,
+    запись в базу - не чаще раза в WRITE_INTERVAL (или сразу, если пользователь был не в сети).
+    При недоступности Redis - только ограниченная по частоте запись в базу.
+    """
+    now = timezone.now()
+    client = get_redis_client()
+    should_write = None
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(LAST_SEEN_KEY, {user.pk: now.timestamp()})
+            pipe.set(_write_key(user.pk), 1, nx=True, ex=WRITE_INTERVAL)
+            _, should_write = pipe.execute()
+        except redis.RedisError:
+            logger.warning('Не удалось отметить активность в Redis', exc_info=True)
+    if should_write is None:
+        should_write = _should_write_local(user.pk, time.monotonic())
+
+    if should_write or not user.is_online:
+        # update() не вызывает сигналы и не перезаписывает остальные поля пользователя
+        User.objects.filter(pk=user.pk).update(last_activity=now, is_online=True)
+
+
+def is_online(user):
+    """В сети ли пользователь: по быстрому хранилищу, без Redis или при его ошибке - по полю is_online"""
+    client = get_redis_client()
+    if client is None:
+        return user.is_online
+    try:
+        score = client.zscore(LAST_SEEN_KEY, user.pk)
+    except redis.RedisError:
+        logger.warning('Не удалось получить статус пользователя из Redis', exc_info=True)
+        return user.is_online
+    return score is not None and score >= (timezone.now() - ONLINE_WINDOW).timestamp()
+
+
+def reconcile():
+    """Пакетная синхронизация last_activity и is_online в базе с быстрым хранилищем"""
+    now = timezone.now()
+    threshold = now - ONLINE_WINDOW
+    client = get_redis_client()
+
+    if client is None:
+        # Без Redis источник истины - last_activity в базе
+        User.objects.filter(last_activity__gte=threshold, is_online=False).update(is_online=True)
+        User.objects.filter(last_activity__lt=threshold, is_online=True).update(is_online=False)
+        return
+
+    client.zremrangebyscore(LAST_SEEN_KEY, '-inf', now.timestamp() - RETENTION)
+    online = {
+        int(user_id): score
+        for user_id, score in client.zrangebyscore(LAST_SEEN_KEY, threshold.timestamp(), '+inf', withscores=True)
+    }
+
+    # Переносим точное время последней активности пачками, одним UPDATE на пачку
+    user_ids = list(online)
+    for start in range(0, len(user_ids), RECONCILE_BATCH_SIZE):
+        batch = user_ids[start:start + RECONCILE_BATCH_SIZE]
+        last_activity = Case(
+            *[
+                When(pk=user_id, then=datetime.fromtimestamp(online[user_id], tz=dt_timezone.utc))
+                for user_id in batch
+            ],
+            output_field=DateTimeField(),
+        )
+        User.objects.filter(pk__in=batch).update(last_activity=last_activity, is_online=True)
+
+    # У всех, кто в сети, last_activity уже свежий - остальные вышли из сети
+    User.objects.filter(is_online=True, last_activity__lt=threshold).update(is_online=False)
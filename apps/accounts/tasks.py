@@ -7,17 +7,9 @@ User = get_user_model()
 
 @shared_task
 def update_online_status():
-    """Обновление статуса 'в сети' пользователей"""
-    # Получаем временную метку для 5 минут назад
-    five_minutes_ago = timezone.now() - timedelta(minutes=5)
-    
-    # Пользователи, которые были активны в последние 5 минут
-    active_users = User.objects.filter(last_activity__gte=five_minutes_ago, is_online=False)
-    active_users.update(is_online=True)
-    
-    # Пользователи, которые не были активны в последние 5 минут
-    inactive_users = User.objects.filter(last_activity__lt=five_minutes_ago, is_online=True)
-    inactive_users.update(is_online=False)
+    """Синхронизация статуса 'в сети' и последней активности с быстрым хранилищем"""
+    from .presence import reconcile
+    reconcile()
 
 @shared_task
 def send_verification_reminder():
@@ -1,18 +1,25 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import AIRecommendation
-from apps.notifications.models import Notification
+from apps.notifications.outbox import outbox_handler, publish
 from django.urls import reverse
 
 @receiver(post_save, sender=AIRecommendation)
-def create_recommendation_notification(sender, instance, created, **kwargs):
-    """Создание уведомления о новых рекомендациях"""
+def publish_recommendation_created(sender, instance, created, **kwargs):
+    """Событие о новых рекомендациях; уведомление рассылается из outbox"""
     if created:
-        # Создаем уведомление для пользователя
-        Notification.objects.create(
-            user=instance.user,
-            notification_type='system',
-            title='Новые рекомендации для вас',
-            message=f'AISha подобрала для вас товары: {instance.reason}',
-            link=reverse('ai_recommendations')
-        )
\ No newline at end of file
+        publish('ai.recommendation_created', recommendation_id=instance.id)
+
+@outbox_handler('ai.recommendation_created')
+def recommendation_notifications(payload):
+    """Уведомление пользователя о новых рекомендациях"""
+    recommendation = AIRecommendation.objects.filter(pk=payload['recommendation_id']).first()
+    if recommendation is None:
+        return []
+    return [{
+        'user_id': recommendation.user_id,
+        'notification_type': 'system',
+        'title': 'Новые рекомендации для вас',
+        'message': f'AISha подобрала для вас товары: {recommendation.reason}',
+        'link': reverse('ai_recommendations'),
+    }]
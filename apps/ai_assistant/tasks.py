@@ -1,11 +1,11 @@
 from celery import shared_task
-from django.db.models import Count, Avg
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 
 from .models import AIRecommendation
 from apps.products.models import Product
-from apps.user_activities.models import UserActivity
+from apps.user_activities.tracking import get_interest_product_ids
 import random
 
 User = get_user_model()
@@ -22,37 +22,39 @@ def generate_daily_recommendations():
             created_at__date=timezone.now().date()
         ).exists():
             # Получаем активность пользователя
-            user_activities = UserActivity.objects.filter(user=user).order_by('-view_time', '-view_count')[:10]
+            viewed_product_ids = get_interest_product_ids(user.pk)
             
-            if user_activities.exists():
+            if viewed_product_ids:
                 # Получаем категории, которые интересуют пользователя
-                category_ids = [activity.product.category_id for activity in user_activities]
+                category_ids = set(
+                    Product.objects.filter(pk__in=viewed_product_ids).values_list('category_id', flat=True)
+                )
                 
                 # Находим похожие товары
                 recommended_products = Product.objects.filter(
                     status='active',
                     category_id__in=category_ids
                 ).exclude(
-                    id__in=[activity.product_id for activity in user_activities]
+                    id__in=viewed_product_ids
                 ).order_by('?')[:8]
                 
                 reason = "Основано на ваших интересах"
             else:
                 # Если нет активности, рекомендуем популярные товары
-                recommended_products = Product.objects.filter(status='active').annotate(
-                    avg_rating=Avg('reviews__rating'),
-                    order_count=Count('order_items')
-                ).order_by('-avg_rating', '-order_count')[:8]
+                recommended_products = Product.objects.filter(status='active').order_by(
+                    '-rating_avg', '-sold_units'
+                )[:8]
                 
                 reason = "Популярные товары, которые могут вам понравиться"
             
             # Сохраняем рекомендации
             if recommended_products.exists():
-                recommendation = AIRecommendation.objects.create(
-                    user=user,
-                    reason=reason
-                )
-                recommendation.products.set(recommended_products)
+                with transaction.atomic():
+                    recommendation = AIRecommendation.objects.create(
+                        user=user,
+                        reason=reason
+                    )
+                    recommendation.products.set(recommended_products)
 
 @shared_task
 def process_search_query(user_id, query):
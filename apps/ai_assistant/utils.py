@@ -4,13 +4,13 @@ from functools import wraps
 import openai
 import google.generativeai as genai
 from django.conf import settings
-from django.db.models import Q
 
 from .models import AISearchQuery
 import json
 import logging
 
 from ..products.models import Product, Category
+from ..products.search import search_products
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -181,12 +181,9 @@ def perform_actual_search(search_params, user):
         if categories.exists():
             products = products.filter(category__in=categories)
 
-    # Применяем ключевые слова
+    # Применяем ключевые слова (полнотекстовый поиск)
     if search_params.get('keywords'):
-        q_objects = Q()
-        for keyword in search_params['keywords']:
-            q_objects |= Q(name__icontains=keyword) | Q(description__icontains=keyword)
-        products = products.filter(q_objects)
+        products = search_products(products, search_params['keywords'])
 
     # Применяем ценовой диапазон
     price_range = search_params.get('price_range', {})
@@ -202,6 +199,10 @@ def perform_actual_search(search_params, user):
             filter_param = {key: value}
             products = products.filter(**filter_param)
 
+    # Сортируем по релевантности, если был полнотекстовый поиск
+    if search_params.get('keywords'):
+        products = products.order_by('-rank')
+
     return products
 
 
@@ -1,15 +1,18 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Max, Count
 from django.utils import timezone
-from django.core.paginator import Paginator
 
 from .models import AISearchQuery, AIRecommendation
 from apps.chat.models import AIConversation, AIMessage
 from .utils import chat_with_ai_assistant, search_products_with_ai, generate_ai_product_description
 from apps.products.models import Product, Category
-from apps.user_activities.models import UserActivity
+from apps.products.search import search_products as search_products_fulltext
+from apps.products.pagination import cursor_paginate
+from apps.products.conditional import conditional_json, make_etag, not_modified, set_validators
+from apps.user_activities.tracking import get_interest_product_ids
 import json
 import uuid
 
@@ -42,9 +45,17 @@ def get_conversation_history(request, conversation_id):
         from apps.chat.models import AIConversation
 
         conversation = AIConversation.objects.get(id=conversation_id, user=request.user)
+
+        # История не изменилась - 304 без загрузки сообщений
+        state = conversation.messages.aggregate(last_created_at=Max('created_at'), count=Count('id'))
+        etag = make_etag(conversation.id, state['last_created_at'], state['count'])
+        response = not_modified(request, etag, state['last_created_at'])
+        if response is not None:
+            return response
+
         messages = conversation.messages.all().order_by('created_at')
 
-        return JsonResponse({
+        return set_validators(request, JsonResponse({
             'status': 'success',
             'messages': [
                 {
@@ -55,7 +66,7 @@ def get_conversation_history(request, conversation_id):
                 }
                 for message in messages
             ]
-        })
+        }), etag, state['last_created_at'])
     except AIConversation.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Диалог не найден'}, status=404)
 
@@ -74,7 +85,7 @@ def search_products(request):
     search_params = search_products_with_ai(query, request.user)
 
     # Базовый запрос
-    products = Product.objects.filter(status='active')
+    products = Product.objects.for_cards().filter(status='active')
 
     # Применяем категории
     if search_params.get('categories'):
@@ -82,12 +93,9 @@ def search_products(request):
         if categories.exists():
             products = products.filter(category__in=categories)
 
-    # Применяем ключевые слова
+    # Применяем ключевые слова (полнотекстовый поиск)
     if search_params.get('keywords'):
-        q_objects = Q()
-        for keyword in search_params['keywords']:
-            q_objects |= Q(name__icontains=keyword) | Q(description__icontains=keyword)
-        products = products.filter(q_objects)
+        products = search_products_fulltext(products, search_params['keywords'])
 
     # Применяем ценовой диапазон
     price_range = search_params.get('price_range', {})
@@ -103,10 +111,9 @@ def search_products(request):
         if param and value:
             products = products.filter(attributes__name__icontains=param, attributes__value__icontains=value)
 
-    # Пагинация результатов
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Курсорная пагинация результатов (по релевантности, если был полнотекстовый поиск)
+    ordering = ('-rank', '-id') if search_params.get('keywords') else ('-created_at', '-id')
+    page_obj = cursor_paginate(request, products, ordering, 12)
 
     # Формируем результаты
     results = []
@@ -117,51 +124,51 @@ def search_products(request):
             'slug': product.slug,
             'price': str(product.price),
             'old_price': str(product.old_price) if product.old_price else None,
-            'image': product.images.first().image.url if product.images.exists() else None,
-            'rating': product.rating,
-            'reviews_count': product.reviews.count(),
+            'image': product.main_image_url,
+            'rating': product.rating_avg,
+            'reviews_count': product.review_count,
             'url': product.get_absolute_url()
         })
 
-    return JsonResponse({
+    return conditional_json(request, {
         'status': 'success',
         'results': results,
-        'total': paginator.count,
-        'pages': paginator.num_pages,
-        'current_page': page_obj.number
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor
     })
 
 
 @login_required
 def get_recommendations(request):
     # Создание рекомендаций на основе активности пользователя
-    user_activities = UserActivity.objects.filter(user=request.user).order_by('-view_time', '-view_count')[:10]
+    viewed_product_ids = get_interest_product_ids(request.user.pk)
 
-    if not user_activities.exists():
+    if not viewed_product_ids:
         # Если нет активности, рекомендуем популярные товары
-        recommended_products = Product.objects.filter(status='active').order_by('-reviews__rating')[:12]
+        recommended_products = Product.objects.for_cards().filter(status='active').order_by('-rating_avg', '-id')[:12]
         reason = "Популярные товары"
     else:
         # Получаем категории, которые интересуют пользователя
-        category_ids = [activity.product.category_id for activity in user_activities]
+        category_ids = set(Product.objects.filter(pk__in=viewed_product_ids).values_list('category_id', flat=True))
 
         # Находим похожие товары
-        recommended_products = Product.objects.filter(
+        recommended_products = Product.objects.for_cards().filter(
             status='active',
             category_id__in=category_ids
         ).exclude(
-            id__in=[activity.product_id for activity in user_activities]
+            id__in=viewed_product_ids
         ).order_by('?')[:12]
 
         reason = "Основано на ваших интересах"
 
     # Сохраняем рекомендации
     if recommended_products.exists():
-        recommendation = AIRecommendation.objects.create(
-            user=request.user,
-            reason=reason
-        )
-        recommendation.products.set(recommended_products)
+        with transaction.atomic():
+            recommendation = AIRecommendation.objects.create(
+                user=request.user,
+                reason=reason
+            )
+            recommendation.products.set(recommended_products)
 
     # Формируем результаты
     results = []
@@ -172,13 +179,13 @@ def get_recommendations(request):
             'slug': product.slug,
             'price': str(product.price),
             'old_price': str(product.old_price) if product.old_price else None,
-            'image': product.images.first().image.url if product.images.exists() else None,
-            'rating': product.rating,
-            'reviews_count': product.reviews.count(),
+            'image': product.main_image_url,
+            'rating': product.rating_avg,
+            'reviews_count': product.review_count,
             'url': product.get_absolute_url()
         })
 
-    return JsonResponse({
+    return conditional_json(request, {
         'status': 'success',
         'results': results,
         'reason': reason
@@ -2,6 +2,7 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .models import Conversation, Message
 
 User = get_user_model()
@@ -94,12 +95,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def save_message(self, conversation, message_type, content):
-        return Message.objects.create(
-            conversation=conversation,
-            sender=self.user,
-            message_type=message_type,
-            content=content
-        )
+        # Сообщение и событие для уведомления фиксируются вместе
+        with transaction.atomic():
+            return Message.objects.create(
+                conversation=conversation,
+                sender=self.user,
+                message_type=message_type,
+                content=content
+            )
     
     @database_sync_to_async
     def mark_messages_as_read(self):
@@ -2,33 +2,40 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.urls import reverse
 from .models import Message
-from apps.notifications.models import Notification
+from apps.notifications.outbox import outbox_handler, publish
 
 @receiver(post_save, sender=Message)
-def create_message_notification(sender, instance, created, **kwargs):
-    """Создание уведомления при получении нового сообщения"""
+def publish_message_created(sender, instance, created, **kwargs):
+    """Событие о новом сообщении; уведомление рассылается из outbox"""
     if created and instance.message_type != 'system':
-        conversation = instance.conversation
-        
-        # Определяем получателя уведомления
-        if instance.sender == conversation.buyer:
-            recipient = conversation.seller
-        else:
-            recipient = conversation.buyer
-        
-        # Формируем заголовок и текст уведомления
-        if instance.message_type == 'ai':
-            title = 'Новое сообщение от ИИ-ассистента'
-            message = 'AISha ответила на ваш вопрос.'
-        else:
-            title = f'Новое сообщение от {instance.sender.username}'
-            message = instance.content[:50] + ('...' if len(instance.content) > 50 else '')
-        
-        # Создаем уведомление
-        Notification.objects.create(
-            user=recipient,
-            notification_type='chat_message',
-            title=title,
-            message=message,
-            link=reverse('chat_detail', args=[conversation.id])
-        )
\ No newline at end of file
+        publish('chat.message_created', message_id=instance.id)
+
+@outbox_handler('chat.message_created')
+def message_notifications(payload):
+    """Уведомление собеседника о новом сообщении"""
+    message = Message.objects.select_related('conversation', 'sender').filter(pk=payload['message_id']).first()
+    if message is None:
+        return []
+    conversation = message.conversation
+    
+    # Определяем получателя уведомления
+    if message.sender_id == conversation.buyer_id:
+        recipient_id = conversation.seller_id
+    else:
+        recipient_id = conversation.buyer_id
+    
+    # Формируем заголовок и текст уведомления
+    if message.message_type == 'ai':
+        title = 'Новое сообщение от ИИ-ассистента'
+        text = 'AISha ответила на ваш вопрос.'
+    else:
+        title = f'Новое сообщение от {message.sender.username}'
+        text = message.content[:50] + ('...' if len(message.content) > 50 else '')
+    
+    return [{
+        'user_id': recipient_id,
+        'notification_type': 'chat_message',
+        'title': title,
+        'message': text,
+        'link': reverse('chat_detail', args=[conversation.id]),
+    }]
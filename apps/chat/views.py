@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Max, Q
 
 from .models import Conversation, Message
 from apps.products.models import Product
 from apps.accounts.models import CustomUser
+from apps.accounts.presence import is_online
 
 @login_required
 def chat_list(request):
@@ -73,7 +75,8 @@ def chat_detail(request, conversation_id):
     context = {
         'conversation': conversation,
         'messages': messages,
-        'interlocutor': interlocutor
+        'interlocutor': interlocutor,
+        'interlocutor_online': is_online(interlocutor),
     }
     return render(request, 'chat/chat_detail.html', context)
 
@@ -104,13 +107,14 @@ def start_chat(request):
             product=product
         )
         
-        # Создаем сообщение
-        Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            message_type='text',
-            content=message_text
-        )
+        # Создаем сообщение (событие для уведомления пишется в той же транзакции)
+        with transaction.atomic():
+            Message.objects.create(
+                conversation=conversation,
+                sender=request.user,
+                message_type='text',
+                content=message_text
+            )
         
         messages.success(request, 'Сообщение отправлено')
         return redirect('chat_detail', conversation_id=conversation.id)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, EmailNotificationSettings
+from .models import Notification, EmailNotificationSettings, OutboxEvent
 
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'title', 'notification_type', 'is_read', 'created_at')
@@ -12,5 +12,12 @@ class EmailNotificationSettingsAdmin(admin.ModelAdmin):
     list_filter = ('order_updates', 'new_messages', 'product_updates', 'promotions')
     search_fields = ('user__username',)
 
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'attempts', 'available_at', 'processed_at', 'created_at')
+    list_filter = ('event_type', 'processed_at')
+    search_fields = ('event_type', 'last_error')
+    readonly_fields = ('event_type', 'payload', 'deliveries', 'attempts', 'last_error', 'processed_at', 'created_at')
+
 admin.site.register(Notification, NotificationAdmin)
-admin.site.register(EmailNotificationSettings, EmailNotificationSettingsAdmin)
\ No newline at end of file
+admin.site.register(EmailNotificationSettings, EmailNotificationSettingsAdmin)
+admin.site.register(OutboxEvent, OutboxEventAdmin)
\ No newline at end of file
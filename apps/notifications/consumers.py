@@ -2,6 +2,7 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import Notification
+from .unread import get_unread_count, invalidate_unread_count
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -82,7 +83,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def get_unread_count(self):
-        return Notification.objects.filter(user=self.user, is_read=False).count()
+        return get_unread_count(self.user.id)
     
     @database_sync_to_async
     def mark_as_read(self, notification_id):
@@ -96,4 +97,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def mark_all_as_read(self):
-        return Notification.objects.filter(user=self.user, is_read=False).update(is_read=True)
+        updated = Notification.objects.filter(user=self.user, is_read=False).update(is_read=True)
+        invalidate_unread_count(self.user.id)
+        return updated
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 class Notification(models.Model):
     TYPE_CHOICES = (
@@ -38,4 +39,29 @@ class EmailNotificationSettings(models.Model):
         verbose_name_plural = _('Настройки email-уведомлений')
     
     def __str__(self):
-        return f"Настройки уведомлений для {self.user.username}"
\ No newline at end of file
+        return f"Настройки уведомлений для {self.user.username}"
+
+class OutboxEvent(models.Model):
+    """Событие для фоновой рассылки (уведомления, WebSocket, email, аналитика), пишется в транзакции изменения"""
+    event_type = models.CharField(_('Тип события'), max_length=50)
+    payload = models.JSONField(_('Данные'), default=dict)
+    deliveries = models.JSONField(_('Выполненные доставки'), default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField(_('Попытки'), default=0)
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    available_at = models.DateTimeField(_('Следующая попытка'), default=timezone.now)
+    processed_at = models.DateTimeField(_('Дата обработки'), null=True, blank=True)
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Событие outbox')
+        verbose_name_plural = _('События outbox')
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='outbox_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
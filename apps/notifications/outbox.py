@@ -0,0 +1,288 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import EmailNotificationSettings, Notification, OutboxEvent
+from .unread import invalidate_unread_count
+
+logger = logging.getLogger(__name__)
+analytics_logger = logging.getLogger('marketplace.analytics')
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+# Задержка повторной попытки удваивается: 30 с, 1 мин, 2 мин, ...
+RETRY_BASE_DELAY = 30
+PROCESSED_RETENTION = timedelta(days=7)
+# Срок, на который обработчик захватывает пачку событий
+CLAIM_TIMEOUT = 5 * 60
+
+# Запуск обработчика не чаще раза в секунду, остальное подберет периодическая задача
+KICK_KEY = 'outbox:kick'
+KICK_INTERVAL = 1
+
+# Настройка EmailNotificationSettings, разрешающая письма для типа уведомления
+EMAIL_SETTING_FIELDS = {
+    'order_status': 'order_updates',
+    'chat_message': 'new_messages',
+    'product_change': 'product_updates',
+}
+
+_builders = {}
+
+
+def outbox_handler(event_type):
+    """
+    Регистрация построителя уведомлений для типа события.
+    Построитель получает payload и возвращает список словарей с полями Notification
+    (user_id, notification_type, title, message, link).
+    """
+    def decorator(func):
+        _builders[event_type] = func
+        return func
+    return decorator
+
+
+def _kick_dispatcher():
+    from .tasks import dispatch_outbox_events
+    
+    # Событие уже зафиксировано - при недоступности брокера его подберет периодическая задача
+    try:
+        if cache.add(KICK_KEY, 1, KICK_INTERVAL):
+            dispatch_outbox_events.delay()
+    except Exception:
+        logger.warning('Не удалось запустить рассылку outbox', exc_info=True)
+
+
+def publish(event_type, **payload):
+    """Запись события в outbox - единственная вставка на стороне запроса; рассылка - после фиксации транзакции"""
+    event = OutboxEvent.objects.create(event_type=event_type, payload=payload)
+    transaction.on_commit(_kick_dispatcher)
+    return event
+
+
+def publish_many(event_type, payloads):
+    """Пакетная запись событий одного типа в outbox одним INSERT"""
+    events = OutboxEvent.objects.bulk_create(
+        [OutboxEvent(event_type=event_type, payload=payload) for payload in payloads], batch_size=BATCH_SIZE * 10
+    )
+    if events:
+        transaction.on_commit(_kick_dispatcher)
+    return events
+
+
+def _create_notifications(events, errors):
+    rows = []
+    for event in events:
+        builder = _builders.get(event.event_type)
+        try:
+            items = builder(event.payload) if builder else []
+        except Exception as e:
+            errors[event.pk] = e
+            continue
+        rows.extend((event, Notification(**item)) for item in items)
+
+    try:
+        with transaction.atomic():
+            Notification.objects.bulk_create([notification for _, notification in rows])
+    except DatabaseError as e:
+        for event, _ in rows:
+            errors[event.pk] = e
+        return
+
+    notification_ids = defaultdict(list)
+    for event, notification in rows:
+        notification_ids[event.pk].append(notification.pk)
+    for event in events:
+        if event.pk not in errors:
+            event.deliveries['notifications'] = notification_ids.get(event.pk, [])
+
+    user_ids = {notification.user_id for _, notification in rows}
+    transaction.on_commit(lambda: [invalidate_unread_count(user_id) for user_id in user_ids])
+
+
+def _mark_delivered(event, stage):
+    """Сохранение отметки о доставке сразу после внешней отправки - при повторе этап не выполняется снова"""
+    event.deliveries[stage] = True
+    OutboxEvent.objects.filter(pk=event.pk).update(deliveries=event.deliveries)
+
+
+def _push(events, notifications, errors):
+    """Отправка уведомлений в группы WebSocket получателей (NotificationConsumer.notification)"""
+    channel_layer = get_channel_layer()
+    for event in events:
+        try:
+            if channel_layer is not None:
+                for notification_id in event.deliveries['notifications']:
+                    notification = notifications.get(notification_id)
+                    if notification is None:
+                        continue
+                    async_to_sync(channel_layer.group_send)(f'user_{notification.user_id}_notifications', {
+                        'type': 'notification',
+                        'notification_id': notification.id,
+                        'title': notification.title,
+                        'message': notification.message,
+                        'notification_type': notification.notification_type,
+                        'link': notification.link,
+                        'created_at': notification.created_at.isoformat(),
+                    })
+            _mark_delivered(event, 'push')
+        except Exception as e:
+            errors[event.pk] = e
+
+
+def _email(events, notifications, errors):
+    """Письма получателям, разрешившим этот тип уведомлений, через одно SMTP-соединение"""
+    recipients = {
+        notification.user_id for notification in notifications.values()
+        if notification.notification_type in EMAIL_SETTING_FIELDS
+    }
+    preferences = {
+        preference.user_id: preference
+        for preference in EmailNotificationSettings.objects.filter(user_id__in=recipients)
+    }
+    site_url = f'https://{Site.objects.get_current().domain}'
+
+    connection = get_connection(fail_silently=False)
+    try:
+        for event in events:
+            messages = []
+            for notification_id in event.deliveries['notifications']:
+                notification = notifications.get(notification_id)
+                if notification is None or not notification.user.email:
+                    continue
+                setting = EMAIL_SETTING_FIELDS.get(notification.notification_type)
+                preference = preferences.get(notification.user_id)
+                # Без сохраненных настроек действуют значения по умолчанию (все включено)
+                if setting is None or (preference is not None and not getattr(preference, setting)):
+                    continue
+                body = render_to_string('emails/notification.txt', {
+                    'notification': notification,
+                    'site_url': site_url,
+                })
+                messages.append(EmailMessage(
+                    notification.title, body, settings.DEFAULT_FROM_EMAIL, [notification.user.email]
+                ))
+            try:
+                if messages:
+                    connection.send_messages(messages)
+                _mark_delivered(event, 'email')
+            except Exception as e:
+                errors[event.pk] = e
+    finally:
+        connection.close()
+
+
+def _analytics(events, errors):
+    """Поток событий для аналитики (отдельный логгер marketplace.analytics)"""
+    for event in events:
+        analytics_logger.info(json.dumps({
+            'event': event.event_type,
+            'id': event.pk,
+            'payload': event.payload,
+            'created_at': event.created_at.isoformat(),
+        }, default=str))
+        _mark_delivered(event, 'analytics')
+
+
+def _pending(events, stage, errors):
+    return [event for event in events if event.pk not in errors and stage not in event.deliveries]
+
+
+def _claim(batch_size, now):
+    """
+    Захват пачки событий и создание уведомлений в одной короткой транзакции.
+    Захваченные события откладываются на CLAIM_TIMEOUT, чтобы другие обработчики их
+    не брали; если обработчик упадет, события вернутся в работу после этого срока.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                processed_at__isnull=True, available_at__lte=now
+            ).order_by('available_at', 'id')[:batch_size]
+        )
+        if not events:
+            return [], {}
+
+        errors = {}
+        pending = _pending(events, 'notifications', errors)
+        if pending:
+            _create_notifications(pending, errors)
+
+        for event in events:
+            event.available_at = now + timedelta(seconds=CLAIM_TIMEOUT)
+        OutboxEvent.objects.bulk_update(events, ['deliveries', 'available_at'])
+    return events, errors
+
+
+def dispatch_outbox(batch_size=BATCH_SIZE):
+    """
+    Обработка пачки событий: уведомления, WebSocket, email, аналитика.
+    Захват событий и вставка уведомлений фиксируются до внешних отправок; каждая
+    выполненная доставка сохраняется в событии сразу, поэтому при ошибке или падении
+    обработчика событие повторяется позже только с оставшимися доставками.
+    Захват идет с SKIP LOCKED, поэтому несколько обработчиков могут работать параллельно.
+    """
+    now = timezone.now()
+    events, errors = _claim(batch_size, now)
+    if not events:
+        return 0
+
+    notification_ids = [
+        notification_id
+        for event in events if event.pk not in errors
+        for notification_id in event.deliveries.get('notifications', [])
+    ]
+    notifications = Notification.objects.select_related('user').in_bulk(notification_ids)
+
+    pending = _pending(events, 'push', errors)
+    if pending:
+        _push(pending, notifications, errors)
+    pending = _pending(events, 'email', errors)
+    if pending:
+        try:
+            _email(pending, notifications, errors)
+        except Exception as e:
+            # Например, SMTP-сервер недоступен при открытии соединения
+            for event in pending:
+                errors.setdefault(event.pk, e)
+    pending = _pending(events, 'analytics', errors)
+    if pending:
+        _analytics(pending, errors)
+
+    now = timezone.now()
+    for event in events:
+        error = errors.get(event.pk)
+        if error is None:
+            event.processed_at = now
+            event.last_error = ''
+            continue
+        event.attempts += 1
+        event.last_error = repr(error)
+        if event.attempts >= MAX_ATTEMPTS:
+            # Событие остается с last_error для разбора вручную
+            event.processed_at = now
+            logger.error('Событие outbox %s #%s не доставлено: %r', event.event_type, event.pk, error)
+        else:
+            event.available_at = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (event.attempts - 1))
+
+    OutboxEvent.objects.bulk_update(events, ['attempts', 'last_error', 'available_at', 'processed_at'])
+    return len(events)
+
+
+def purge_outbox():
+    """Удаление успешно обработанных событий старше PROCESSED_RETENTION"""
+    deleted, _ = OutboxEvent.objects.filter(
+        processed_at__lt=timezone.now() - PROCESSED_RETENTION, last_error=''
+    ).delete()
+    return deleted
@@ -1,4 +1,12 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
-from .models import Notification
\ No newline at end of file
+from .models import Notification
+from .unread import invalidate_unread_count
+
+@receiver([post_save, post_delete], sender=Notification)
+def unread_count_invalidate(sender, instance, **kwargs):
+    """Сброс кэша количества непрочитанных уведомлений пользователя"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_unread_count(user_id))
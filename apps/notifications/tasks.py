@@ -0,0 +1,22 @@
+from celery import shared_task
+
+
+@shared_task
+def dispatch_outbox_events():
+    """Рассылка событий outbox, пока есть готовые к обработке"""
+    from .outbox import BATCH_SIZE, dispatch_outbox
+    
+    total = 0
+    while True:
+        processed = dispatch_outbox()
+        total += processed
+        if processed < BATCH_SIZE:
+            return total
+
+
+@shared_task
+def purge_outbox_events():
+    """Удаление старых обработанных событий outbox"""
+    from .outbox import purge_outbox
+    
+    return purge_outbox()
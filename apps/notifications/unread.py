@@ -0,0 +1,23 @@
+from django.core.cache import cache
+
+from .models import Notification
+
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    """Количество непрочитанных уведомлений пользователя (из кэша)"""
+    key = _cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_unread_count(user_id):
+    cache.delete(_cache_key(user_id))
@@ -5,14 +5,19 @@ from django.http import JsonResponse
 
 from .models import Notification, EmailNotificationSettings
 from .forms import EmailNotificationSettingsForm
+from .unread import get_unread_count, invalidate_unread_count
+from apps.products.pagination import cursor_paginate
+
+NOTIFICATIONS_PER_PAGE = 20
 
 @login_required
 def notification_list(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=request.user)
+    unread_count = get_unread_count(request.user.pk)
+    page = cursor_paginate(request, notifications, ('-created_at', '-id'), NOTIFICATIONS_PER_PAGE)
     
     return render(request, 'notifications/notification_list.html', {
-        'notifications': notifications,
+        'notifications': page,
         'unread_count': unread_count
     })
 
@@ -34,6 +39,7 @@ def mark_as_read(request, notification_id):
 @login_required
 def mark_all_as_read(request):
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    invalidate_unread_count(request.user.pk)
     
     # Вместо is_ajax() проверяем заголовок
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Order, OrderItem, OrderStatus
+from apps.products.sales import record_order_status_change
+from .export import export_response
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -17,6 +19,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('buyer__username', 'seller__username', 'full_name', 'phone', 'email')
     readonly_fields = ('created_at', 'updated_at')
     inlines = [OrderItemInline, OrderStatusInline]
+    actions = ['export_csv', 'export_jsonl']
     fieldsets = (
         ('Основная информация', {
             'fields': ('buyer', 'seller', 'status', 'total_price')
@@ -34,9 +37,12 @@ class OrderAdmin(admin.ModelAdmin):
     
     def save_model(self, request, obj, form, change):
         """При изменении статуса заказа в админке создаем запись о статусе"""
+        old_status = None
         if change and 'status' in form.changed_data:
-            old_obj = Order.objects.get(pk=obj.pk)
+            # Форма админки выполняется в транзакции: блокировка держится до сохранения
+            old_obj = Order.objects.select_for_update().get(pk=obj.pk)
             if old_obj.status != obj.status:
+                old_status = old_obj.status
                 OrderStatus.objects.create(
                     order=obj,
                     status=obj.status,
@@ -44,5 +50,17 @@ class OrderAdmin(admin.ModelAdmin):
                     created_by=request.user
                 )
         super().save_model(request, obj, form, change)
+        
+        # Отмена заказа (или восстановление из отмены) меняет счетчики продаж
+        if old_status is not None:
+            record_order_status_change(obj, old_status, obj.status)
+
+    @admin.action(description='Выгрузить выбранные заказы с позициями (CSV)')
+    def export_csv(self, request, queryset):
+        return export_response(queryset.order_by('-created_at', '-id'), 'csv')
+    
+    @admin.action(description='Выгрузить выбранные заказы с позициями (JSONL)')
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset.order_by('-created_at', '-id'), 'jsonl')
 
 admin.site.register(Order, OrderAdmin)
@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderStatus
+from apps.products.models import CartItem, Product
+from apps.products.sales import record_sales
+from .rollup import record_orders_placed
+from .reservations import InsufficientStock, take_reservations, unreserve_quantities
+
+
+def get_checkout_items(user):
+    """Позиции корзины вместе с товарами и продавцами одним запросом"""
+    return list(
+        CartItem.objects.filter(cart__user=user).select_related('product__seller').order_by('product_id')
+    )
+
+
+def group_by_seller(cart_items):
+    """Группировка позиций корзины по продавцу (порядок сохраняется)"""
+    sellers_products = defaultdict(list)
+    for item in cart_items:
+        sellers_products[item.product.seller].append(item)
+    return dict(sellers_products)
+
+
+def check_stock(cart_items):
+    """Предварительная проверка наличия по уже загруженным товарам (без блокировок)"""
+    for item in cart_items:
+        if item.quantity > item.product.stock:
+            raise InsufficientStock(item.product)
+
+
+def decrement_stock(product_id, quantity, own_reserved=0):
+    """
+    Условное атомарное списание остатка: строка обновляется, только если остатка за вычетом
+    чужих резервов хватает. own_reserved - снятый резерв самого покупателя. Возвращает True при успехе.
+    """
+    # В SET все выражения видят старые значения stock и reserved_stock
+    return bool(Product.objects.filter(
+        pk=product_id, stock__gte=F('reserved_stock') - own_reserved + quantity
+    ).update(
+        stock=F('stock') - quantity,
+        reserved_stock=Greatest(F('reserved_stock') - own_reserved, Value(0)),
+        status=Case(
+            When(stock=quantity, then=Value('out_of_stock')),
+            default=F('status'),
+            output_field=CharField(),
+        ),
+    ))
+
+
+def restore_stock(items):
+    """
+    Возврат остатков при отмене заказа условными UPDATE без чтения строк.
+    items - пары (product_id, quantity); товары обходятся по возрастанию id, как при списании.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+
+    now = timezone.now()
+    for product_id in sorted(quantities):
+        Product.objects.filter(pk=product_id).update(
+            stock=F('stock') + quantities[product_id],
+            status=Case(
+                When(status='out_of_stock', then=Value('active')),
+                default=F('status'),
+                output_field=CharField(),
+            ),
+            updated_at=now,
+        )
+
+
+def reserve_stock(user, cart_items):
+    """
+    Списание остатков позиций корзины, иначе InsufficientStock и откат транзакции.
+    Собственный резерв покупателя снимается вместе со списанием. Товары обходятся по
+    возрастанию id, чтобы параллельные оформления блокировали строки в одном порядке.
+    """
+    quantities = defaultdict(int)
+    products = {}
+    for item in cart_items:
+        quantities[item.product_id] += item.quantity
+        products[item.product_id] = item.product
+
+    held = take_reservations(user)
+    # Резервы товаров, которых уже нет в корзине, просто освобождаются
+    unreserve_quantities({product_id: quantity for product_id, quantity in held.items() if product_id not in quantities})
+
+    for product_id in sorted(quantities):
+        own = held.get(product_id, 0)
+        if not decrement_stock(product_id, quantities[product_id], own):
+            row = Product.objects.filter(pk=product_id).values_list('stock', 'reserved_stock').first()
+            available = max(row[0] - row[1] + own, 0) if row else 0
+            raise InsufficientStock(products[product_id], available)
+
+
+def create_orders(user, lines, details):
+    """
+    Заказы по одному на продавца, позиции и статусы пачками, счетчики продаж и дневная сводка.
+    lines - {seller_id: [(product_id, price, quantity), ...]}, details - данные покупателя из OrderForm.
+    Вызывается внутри транзакции после списания остатков.
+    """
+    orders = []
+    order_items = []
+    order_statuses = []
+    for seller_id, seller_lines in lines.items():
+        order = Order.objects.create(
+            buyer=user,
+            seller_id=seller_id,
+            full_name=details['full_name'],
+            email=details['email'],
+            phone=details['phone'],
+            address=details['address_line'],
+            city=details['city'],
+            postal_code=details['postal_code'],
+            status='new',
+            total_price=sum(price * quantity for _, price, quantity in seller_lines),
+            comment=details['comment'],
+        )
+        orders.append(order)
+        order_items.extend(
+            OrderItem(order=order, product_id=product_id, price=price, quantity=quantity)
+            for product_id, price, quantity in seller_lines
+        )
+        order_statuses.append(
+            OrderStatus(order=order, status='new', comment='Заказ создан', created_by=user)
+        )
+
+    OrderItem.objects.bulk_create(order_items)
+    OrderStatus.objects.bulk_create(order_statuses)
+
+    # Каждый товар принадлежит одному продавцу, поэтому один вызов дает +1 заказ на товар
+    record_sales(
+        (product_id, quantity)
+        for seller_lines in lines.values()
+        for product_id, _, quantity in seller_lines
+    )
+    record_orders_placed(orders, order_items)
+    return orders
+
+
+def place_orders(user, cart_items, details):
+    """
+    Оформление заказов из позиций корзины в короткой транзакции:
+    списание остатков, заказы, очистка корзины.
+    """
+    lines = defaultdict(list)
+    for item in cart_items:
+        lines[item.product.seller_id].append((item.product_id, item.product.price, item.quantity))
+
+    with transaction.atomic():
+        reserve_stock(user, cart_items)
+        orders = create_orders(user, lines, details)
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+    return orders
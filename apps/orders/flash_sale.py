@@ -0,0 +1,408 @@
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import InterfaceError, OperationalError, transaction
+
+from .checkout import create_orders, decrement_stock
+from .reservations import InsufficientStock
+from apps.products.models import CartItem, Product
+from apps.notifications.models import Notification
+from apps.user_activities.store import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+QUEUE_KEY = 'flash:orders'
+# Заказы, взятые из очереди на сохранение; удаляются после фиксации транзакции
+PROCESSING_KEY = 'flash:processing'
+# Заказы, которые не удалось сохранить по непреходящей причине, - для разбора вручную
+DEAD_LETTER_KEY = 'flash:dead'
+STOCK_KEY_PREFIX = 'flash:stock:'
+PERSIST_BATCH_SIZE = 200
+
+# Сохранение заказов и сверка остатков выполняются одним процессом
+LOCK_KEY = 'flash_sale:lock'
+LOCK_TIMEOUT = 5 * 60
+
+ORDER_DETAIL_FIELDS = ('full_name', 'email', 'phone', 'address_line', 'city', 'postal_code', 'comment')
+
+# KEYS - счетчики остатков, последний ключ - очередь; ARGV - количества, последний аргумент - заказ.
+# Возвращает 0 при успехе или номер (с 1) товара, которого не хватило.
+ADMIT_SCRIPT = """
+local count = #KEYS - 1
+for i = 1, count do
+    local left = tonumber(redis.call('GET', KEYS[i]) or '-1')
+    if left < tonumber(ARGV[i]) then
+        return i
+    end
+end
+for i = 1, count do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+end
+redis.call('RPUSH', KEYS[count + 1], ARGV[count + 1])
+return 0
+"""
+
+# KEYS[1] - очередь, KEYS[2] - список обрабатываемых; ARGV[1] - размер пачки.
+# Пачка переносится из очереди в список обрабатываемых и возвращается.
+DRAIN_SCRIPT = """
+local payloads = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #payloads > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(payloads))
+    redis.call('LTRIM', KEYS[1], #payloads, -1)
+end
+return payloads
+"""
+
+# KEYS[1] - список обрабатываемых, KEYS[2] - очередь.
+# Заказы прерванной обработки возвращаются в начало очереди в прежнем порядке.
+REQUEUE_SCRIPT = """
+local payloads = redis.call('LRANGE', KEYS[1], 0, -1)
+for i = #payloads, 1, -1 do
+    redis.call('LPUSH', KEYS[2], payloads[i])
+end
+redis.call('DEL', KEYS[1])
+return #payloads
+"""
+
+# KEYS[1] - счетчик остатка, KEYS[2] - очередь, KEYS[3] - список обрабатываемых;
+# ARGV[1] - id товара, ARGV[2] - доступно в базе.
+# Остаток = доступно в базе минус количество в еще не сохраненных заказах.
+RECONCILE_SCRIPT = """
+local product_id = tonumber(ARGV[1])
+local queued = 0
+for k = 2, 3 do
+    for _, payload in ipairs(redis.call('LRANGE', KEYS[k], 0, -1)) do
+        for _, line in ipairs(cjson.decode(payload)['items']) do
+            if line[1] == product_id then
+                queued = queued + line[4]
+            end
+        end
+    end
+end
+local left = math.max(tonumber(ARGV[2]) - queued, 0)
+redis.call('SET', KEYS[1], left)
+return left
+"""
+
+
+def _stock_key(product_id):
+    return f'{STOCK_KEY_PREFIX}{product_id}'
+
+
+def _queued_units(payloads, product_id):
+    return sum(
+        line[3]
+        for payload in payloads
+        for line in json.loads(payload)['items'] if line[0] == product_id
+    )
+
+
+class RedisFlashSaleStore:
+    """Счетчики остатков распродажи и очередь принятых заказов в Redis (атомарность - Lua-скрипты)"""
+
+    def __init__(self, client):
+        self.client = client
+        self.admit_script = client.register_script(ADMIT_SCRIPT)
+        self.drain_script = client.register_script(DRAIN_SCRIPT)
+        self.requeue_script = client.register_script(REQUEUE_SCRIPT)
+        self.reconcile_script = client.register_script(RECONCILE_SCRIPT)
+
+    def init_stock(self, levels):
+        """Начальные остатки для товаров без счетчика: {product_id: доступно}"""
+        pipe = self.client.pipeline(transaction=False)
+        for product_id, left in levels.items():
+            pipe.set(_stock_key(product_id), left, nx=True)
+        pipe.execute()
+
+    def available(self, product_id):
+        value = self.client.get(_stock_key(product_id))
+        return None if value is None else max(int(value), 0)
+
+    def admit(self, quantities, payload):
+        """Списание всех количеств и постановка заказа в очередь; возвращает id товара, которого не хватило"""
+        product_ids = list(quantities)
+        failed = self.admit_script(
+            keys=[_stock_key(product_id) for product_id in product_ids] + [QUEUE_KEY],
+            args=[quantities[product_id] for product_id in product_ids] + [payload],
+        )
+        return product_ids[failed - 1] if failed else None
+
+    def drain(self, batch_size):
+        """Пачка заказов из очереди; до ack() заказы остаются в PROCESSING_KEY"""
+        payloads = self.drain_script(keys=[QUEUE_KEY, PROCESSING_KEY], args=[batch_size])
+        return [payload.decode() for payload in payloads]
+
+    def ack(self, payload):
+        self.client.lrem(PROCESSING_KEY, 1, payload)
+
+    def requeue_processing(self):
+        """Возврат в очередь заказов, обработка которых прервалась (падение или перезапуск воркера)"""
+        return self.requeue_script(keys=[PROCESSING_KEY, QUEUE_KEY])
+
+    def dead_letter(self, payload):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(DEAD_LETTER_KEY, payload)
+        pipe.lrem(PROCESSING_KEY, 1, payload)
+        pipe.execute()
+
+    def reconcile(self, levels):
+        for product_id, left in levels.items():
+            self.reconcile_script(keys=[_stock_key(product_id), QUEUE_KEY, PROCESSING_KEY], args=[product_id, left])
+
+    def tracked_product_ids(self):
+        return {
+            int(key.decode()[len(STOCK_KEY_PREFIX):])
+            for key in self.client.scan_iter(match=f'{STOCK_KEY_PREFIX}*', count=500)
+        }
+
+    def discard(self, product_ids):
+        if product_ids:
+            self.client.delete(*[_stock_key(product_id) for product_id in product_ids])
+
+
+class LocalFlashSaleStore:
+    """
+    Замена Redis в памяти процесса (разработка без Redis).
+    Заказы сохраняются только задачей, выполняемой в том же процессе (например, CELERY_TASK_ALWAYS_EAGER).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stock = {}
+        self.queue = deque()
+        self.processing = []
+        self.dead = []
+
+    def init_stock(self, levels):
+        with self.lock:
+            for product_id, left in levels.items():
+                self.stock.setdefault(product_id, left)
+
+    def available(self, product_id):
+        with self.lock:
+            left = self.stock.get(product_id)
+            return None if left is None else max(left, 0)
+
+    def admit(self, quantities, payload):
+        with self.lock:
+            for product_id, quantity in quantities.items():
+                if self.stock.get(product_id, -1) < quantity:
+                    return product_id
+            for product_id, quantity in quantities.items():
+                self.stock[product_id] -= quantity
+            self.queue.append(payload)
+            return None
+
+    def drain(self, batch_size):
+        with self.lock:
+            payloads = [self.queue.popleft() for _ in range(min(batch_size, len(self.queue)))]
+            self.processing.extend(payloads)
+            return payloads
+
+    def ack(self, payload):
+        with self.lock:
+            self.processing.remove(payload)
+
+    def requeue_processing(self):
+        with self.lock:
+            count = len(self.processing)
+            self.queue.extendleft(reversed(self.processing))
+            self.processing = []
+            return count
+
+    def dead_letter(self, payload):
+        with self.lock:
+            self.processing.remove(payload)
+            self.dead.append(payload)
+
+    def reconcile(self, levels):
+        with self.lock:
+            pending = [*self.queue, *self.processing]
+            for product_id, left in levels.items():
+                self.stock[product_id] = max(left - _queued_units(pending, product_id), 0)
+
+    def tracked_product_ids(self):
+        with self.lock:
+            return set(self.stock)
+
+    def discard(self, product_ids):
+        with self.lock:
+            for product_id in product_ids:
+                self.stock.pop(product_id, None)
+
+
+_stores = {}
+_lock = threading.Lock()
+
+
+def get_flash_sale_store():
+    client = get_redis_client()
+    key = 'redis' if client is not None else 'local'
+    with _lock:
+        if key not in _stores:
+            _stores[key] = RedisFlashSaleStore(client) if client is not None else LocalFlashSaleStore()
+        return _stores[key]
+
+
+def flash_available(product):
+    """Доступный остаток товара распродажи по счетчику быстрого хранилища"""
+    store = get_flash_sale_store()
+    left = store.available(product.pk)
+    if left is None:
+        store.init_stock({product.pk: product.available_stock})
+        left = store.available(product.pk)
+    return left or 0
+
+
+def admit_flash_order(user, cart_items, details):
+    """
+    Прием заказа на товары распродажи без обращения к строкам товаров в базе:
+    остатки списываются атомарно в быстром хранилище, заказ ставится в очередь
+    и сохраняется задачей persist_flash_orders. При нехватке - InsufficientStock.
+    """
+    store = get_flash_sale_store()
+    store.init_stock({item.product_id: item.product.available_stock for item in cart_items})
+
+    quantities = defaultdict(int)
+    products = {}
+    for item in cart_items:
+        quantities[item.product_id] += item.quantity
+        products[item.product_id] = item.product
+
+    payload = json.dumps({
+        'user_id': user.pk,
+        'details': {field: details.get(field) or '' for field in ORDER_DETAIL_FIELDS},
+        'items': [
+            [item.product_id, item.product.seller_id, str(item.product.price), item.quantity, item.product.name]
+            for item in cart_items
+        ],
+    })
+    failed = store.admit(quantities, payload)
+    if failed is not None:
+        raise InsufficientStock(products[failed], store.available(failed) or 0)
+
+    CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+
+class ProductGone(Exception):
+    """Товар из принятого заказа удален до сохранения заказа"""
+
+    def __init__(self, product_id, name):
+        self.product_id = product_id
+        self.name = name
+        super().__init__(f'Товар #{product_id} удален')
+
+
+def _persist(data, user):
+    lines = defaultdict(list)
+    quantities = defaultdict(int)
+    names = {}
+    for line in data['items']:
+        product_id, seller_id, price, quantity = line[:4]
+        lines[seller_id].append((product_id, Decimal(price), quantity))
+        quantities[product_id] += quantity
+        names[product_id] = line[4] if len(line) > 4 else f'#{product_id}'
+
+    with transaction.atomic():
+        existing = set(Product.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+        for product_id in quantities:
+            if product_id not in existing:
+                raise ProductGone(product_id, names[product_id])
+        # Условное списание в базе - последняя защита от продажи сверх остатка
+        for product_id in sorted(quantities):
+            if not decrement_stock(product_id, quantities[product_id]):
+                raise InsufficientStock(Product.objects.get(pk=product_id))
+        return create_orders(user, lines, data['details'])
+
+
+def _reject(user, name, link=''):
+    Notification.objects.create(
+        user=user,
+        notification_type='order_status',
+        title='Заказ не оформлен',
+        message=f'К сожалению, товар "{name}" закончился, и заказ не был оформлен.',
+        link=link
+    )
+
+
+def persist_admitted_orders(batch_size=PERSIST_BATCH_SIZE):
+    """
+    Сохранение принятых заказов в базу пачками. Заказ удаляется из PROCESSING_KEY только
+    после фиксации его транзакции, поэтому заказы прерванного запуска (падение воркера,
+    временная ошибка базы) возвращаются в очередь при следующем запуске. Заказ, который
+    не сохранить по другой причине, переносится в DEAD_LETTER_KEY, чтобы не блокировать очередь.
+    """
+    store = get_flash_sale_store()
+    requeued = store.requeue_processing()
+    if requeued:
+        logger.warning('Возвращено в очередь заказов распродажи после прерванной обработки: %s', requeued)
+    persisted = 0
+    while True:
+        payloads = store.drain(batch_size)
+        if not payloads:
+            break
+
+        orders = [json.loads(payload) for payload in payloads]
+        users = User.objects.in_bulk({data['user_id'] for data in orders})
+        for payload, data in zip(payloads, orders):
+            user = users.get(data['user_id'])
+            if user is None:
+                logger.error('Покупатель #%s заказа распродажи не найден, заказ перенесен в %s', data['user_id'], DEAD_LETTER_KEY)
+                store.dead_letter(payload)
+                continue
+            try:
+                _persist(data, user)
+            except InsufficientStock as e:
+                _reject(user, e.product.name, e.product.get_absolute_url())
+            except ProductGone as e:
+                _reject(user, e.name)
+            except (OperationalError, InterfaceError):
+                # Несохраненные заказы остаются в PROCESSING_KEY до следующего запуска
+                raise
+            except Exception:
+                logger.exception('Заказ распродажи не сохранен и перенесен в %s', DEAD_LETTER_KEY)
+                store.dead_letter(payload)
+                continue
+            else:
+                persisted += 1
+            store.ack(payload)
+
+        if len(payloads) < batch_size:
+            break
+    return persisted
+
+
+def reconcile_flash_sales():
+    """
+    Сверка счетчиков с базой: остаток = доступно в базе минус заказы в очереди.
+    Счетчики товаров, снятых с распродажи, удаляются.
+    """
+    store = get_flash_sale_store()
+    levels = {
+        product_id: max(stock - reserved, 0)
+        for product_id, stock, reserved in Product.objects.filter(flash_sale=True).values_list(
+            'id', 'stock', 'reserved_stock'
+        )
+    }
+    store.reconcile(levels)
+    store.discard(store.tracked_product_ids() - levels.keys())
+    return len(levels)
+
+
+def process_flash_sales():
+    """Сохранение очереди и сверка остатков под общей блокировкой (сверка видит только несохраненные заказы)"""
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return 0
+    try:
+        persisted = persist_admitted_orders()
+        reconcile_flash_sales()
+    finally:
+        cache.delete(LOCK_KEY)
+    return persisted
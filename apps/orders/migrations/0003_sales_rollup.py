@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0076_product_flash_sale'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0002_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('status', models.CharField(choices=[('new', 'Новый'), ('processing', 'В обработке'), ('shipped', 'Отправлен'), ('completed', 'Завершён'), ('cancelled', 'Отменён')], max_length=20, verbose_name='Статус')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Продажи продавца за день',
+                'verbose_name_plural': 'Продажи продавцов по дням',
+                'unique_together': {('seller', 'day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('units', models.IntegerField(default=0, verbose_name='Продано единиц')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='products.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'unique_together': {('product', 'day')},
+                'indexes': [models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx')],
+            },
+        ),
+    ]
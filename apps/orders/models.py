@@ -62,4 +62,53 @@ class OrderStatus(models.Model):
         verbose_name_plural = _('Статусы заказов')
     
     def __str__(self):
-        return f"Статус {self.status} для заказа #{self.order.id}"
\ No newline at end of file
+        return f"Статус {self.status} для заказа #{self.order.id}"
+class StockReservation(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(_('Количество'))
+    expires_at = models.DateTimeField(_('Действует до'), db_index=True)
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Резерв товара')
+        verbose_name_plural = _('Резервы товаров')
+        unique_together = ('user', 'product')
+    
+    def __str__(self):
+        return f"Резерв {self.quantity} x {self.product_id} для {self.user_id}"
+
+class SellerSalesDay(models.Model):
+    """Сводка заказов продавца за день по текущему статусу заказов (apps.orders.rollup)"""
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sales_days')
+    day = models.DateField(_('День'))
+    status = models.CharField(_('Статус'), max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(_('Заказов'), default=0)
+    revenue = models.DecimalField(_('Сумма'), max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Продажи продавца за день')
+        verbose_name_plural = _('Продажи продавцов по дням')
+        unique_together = ('seller', 'day', 'status')
+    
+    def __str__(self):
+        return f"{self.seller_id} {self.day} {self.status}: {self.order_count}"
+
+class ProductSalesDay(models.Model):
+    """Продажи товара за день без отмененных заказов (apps.orders.rollup)"""
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_sales_days')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='sales_days')
+    day = models.DateField(_('День'))
+    units = models.IntegerField(_('Продано единиц'), default=0)
+    revenue = models.DecimalField(_('Сумма'), max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Продажи товара за день')
+        verbose_name_plural = _('Продажи товаров по дням')
+        unique_together = ('product', 'day')
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} {self.day}: {self.units}"
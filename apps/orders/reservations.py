@@ -0,0 +1,141 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import StockReservation
+from apps.products.models import Product
+
+
+class InsufficientStock(Exception):
+    """Товара не хватает для оформления заказа"""
+
+    def __init__(self, product, available=None):
+        self.product = product
+        self.available = product.stock if available is None else available
+        super().__init__(f'Недостаточно товара "{product.name}": осталось {self.available} шт.')
+
+
+def _delete_returning(where, params):
+    """Удаление резервов с возвратом пар (product_id, quantity) - каждую строку получает только один процесс"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {StockReservation._meta.db_table} WHERE {where} RETURNING product_id, quantity',
+            params
+        )
+        return cursor.fetchall()
+
+
+def _held_quantities(rows):
+    held = defaultdict(int)
+    for product_id, quantity in rows:
+        held[product_id] += quantity
+    return held
+
+
+def unreserve_quantities(held):
+    """Уменьшение reserved_stock одним UPDATE"""
+    if not held:
+        return 0
+    quantities = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in held.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(pk__in=held).update(
+        reserved_stock=Greatest(F('reserved_stock') - quantities, Value(0))
+    )
+
+
+def take_reservations(user):
+    """Снятие всех резервов пользователя; возвращает {product_id: quantity} без изменения reserved_stock"""
+    return _held_quantities(_delete_returning('user_id = %s', [user.pk]))
+
+
+def release_reservations(user, product_ids=None):
+    """Освобождение резервов пользователя (всех или по указанным товарам)"""
+    with transaction.atomic():
+        if product_ids is None:
+            rows = _delete_returning('user_id = %s', [user.pk])
+        else:
+            rows = _delete_returning('user_id = %s AND product_id = ANY(%s)', [user.pk, list(product_ids)])
+        held = _held_quantities(rows)
+        unreserve_quantities(held)
+    return held
+
+
+def reserve_cart(user, cart_items):
+    """
+    Резерв товаров корзины на STOCK_RESERVATION_TTL секунд.
+    Прежние резервы пользователя заменяются новыми; каждый товар резервируется условным
+    UPDATE (остаток минус чужие резервы должен покрывать количество), строки товаров
+    блокируются только до конца этой короткой транзакции.
+    """
+    quantities = defaultdict(int)
+    products = {}
+    for item in cart_items:
+        quantities[item.product_id] += item.quantity
+        products[item.product_id] = item.product
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    with transaction.atomic():
+        unreserve_quantities(take_reservations(user))
+
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            updated = Product.objects.filter(
+                pk=product_id, stock__gte=F('reserved_stock') + quantity
+            ).update(reserved_stock=F('reserved_stock') + quantity)
+            if not updated:
+                available = Product.objects.filter(pk=product_id).values_list('stock', 'reserved_stock').first()
+                raise InsufficientStock(products[product_id], max(available[0] - available[1], 0) if available else 0)
+
+        StockReservation.objects.bulk_create([
+            StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in quantities.items()
+        ])
+    return expires_at
+
+
+def available_stock(product, user=None):
+    """Доступный пользователю остаток: остаток минус резервы, кроме его собственного"""
+    own = 0
+    if user is not None and user.is_authenticated and product.reserved_stock:
+        own = StockReservation.objects.filter(user=user, product=product).values_list('quantity', flat=True).first() or 0
+    return max(product.stock - product.reserved_stock + own, 0)
+
+
+def resync_reserved_stock(product_ids):
+    """
+    Сверка reserved_stock указанных товаров с суммой их активных резервов - исправляет
+    расхождения, которые вычитание в unreserve_quantities не устраняет. Блокируются только
+    эти строки (по возрастанию id), поэтому сумма считается уже с учетом зафиксированных
+    параллельных резервов.
+    """
+    if not product_ids:
+        return 0
+    held = StockReservation.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    with transaction.atomic():
+        locked = list(
+            Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', flat=True)
+        )
+        return Product.objects.filter(pk__in=locked).update(
+            reserved_stock=Coalesce(Subquery(held), Value(0))
+        )
+
+
+def expire_reservations():
+    """
+    Снятие просроченных резервов одним DELETE ... RETURNING; reserved_stock пересчитывается
+    только у товаров, чьи резервы истекли, - остальные строки товаров не блокируются.
+    """
+    with transaction.atomic():
+        held = _held_quantities(_delete_returning('expires_at <= %s', [timezone.now()]))
+        resync_reserved_stock(held)
+    return sum(held.values())
@@ -0,0 +1,248 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, RowNumber, TruncDate
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from .models import Order, OrderItem, ProductSalesDay, SellerSalesDay
+
+logger = logging.getLogger(__name__)
+
+UPSERT_PAGE_SIZE = 500
+REBUILD_BATCH_SIZE = 1000
+
+# Статусы, которые входят в выручку на графике и в отчетах
+REVENUE_STATUSES = ('new', 'processing', 'shipped', 'completed')
+
+
+def _order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _upsert_seller_days(deltas):
+    """Прибавление приращений {(seller_id, day, status): [order_count, revenue]} одним INSERT ... ON CONFLICT"""
+    rows = sorted(
+        (seller_id, day, status, count, revenue) for (seller_id, day, status), (count, revenue) in deltas.items()
+    )
+    if not rows:
+        return
+    sql = f"""
+        INSERT INTO {SellerSalesDay._meta.db_table} AS sales (seller_id, day, status, order_count, revenue)
+        VALUES %s
+        ON CONFLICT (seller_id, day, status) DO UPDATE SET
+            order_count = sales.order_count + EXCLUDED.order_count,
+            revenue = sales.revenue + EXCLUDED.revenue
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        execute_values(cursor.cursor, sql, rows, page_size=UPSERT_PAGE_SIZE)
+
+
+def _upsert_product_days(deltas):
+    """Прибавление приращений {(seller_id, product_id, day): [units, revenue]} одним INSERT ... ON CONFLICT"""
+    # Порядок по ключу конфликта (product_id, day) - параллельные вставки блокируют строки в одном порядке
+    rows = sorted(
+        (product_id, day, seller_id, units, revenue) for (seller_id, product_id, day), (units, revenue) in deltas.items()
+    )
+    if not rows:
+        return
+    sql = f"""
+        INSERT INTO {ProductSalesDay._meta.db_table} AS sales (product_id, day, seller_id, units, revenue)
+        VALUES %s
+        ON CONFLICT (product_id, day) DO UPDATE SET
+            units = sales.units + EXCLUDED.units,
+            revenue = sales.revenue + EXCLUDED.revenue
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        execute_values(cursor.cursor, sql, rows, page_size=UPSERT_PAGE_SIZE)
+
+
+def _product_deltas(order, items, sign):
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    day = _order_day(order)
+    for product_id, price, quantity in items:
+        delta = deltas[(order.seller_id, product_id, day)]
+        delta[0] += sign * quantity
+        delta[1] += sign * price * quantity
+    return deltas
+
+
+def _apply_after_commit(seller_deltas, product_deltas):
+    """
+    Запись приращений после фиксации транзакции заказа: оформление не ждет блокировок
+    строк сводки. При ошибке сводку восстанавливает rebuild_sales_rollup.
+    """
+    def apply():
+        try:
+            with transaction.atomic():
+                _upsert_seller_days(seller_deltas)
+                _upsert_product_days(product_deltas)
+        except DatabaseError:
+            logger.exception('Не удалось обновить сводку продаж')
+    transaction.on_commit(apply)
+
+
+def record_orders_placed(orders, order_items):
+    """Учет новых заказов в сводке: по строке на продавца/день и на товар/день"""
+    seller_deltas = defaultdict(lambda: [0, Decimal('0')])
+    for order in orders:
+        delta = seller_deltas[(order.seller_id, _order_day(order), order.status)]
+        delta[0] += 1
+        delta[1] += order.total_price
+
+    product_deltas = defaultdict(lambda: [0, Decimal('0')])
+    for item in order_items:
+        delta = product_deltas[(item.order.seller_id, item.product_id, _order_day(item.order))]
+        delta[0] += item.quantity
+        delta[1] += item.price * item.quantity
+
+    _apply_after_commit(seller_deltas, product_deltas)
+
+
+def record_status_change(order, old_status, new_status):
+    """
+    Перенос заказа между статусами в сводке продавца; при отмене или восстановлении
+    из отмены - корректировка продаж товаров (отмененные заказы в них не входят).
+    """
+    if old_status == new_status:
+        return
+    day = _order_day(order)
+    seller_deltas = {
+        (order.seller_id, day, old_status): [-1, -order.total_price],
+        (order.seller_id, day, new_status): [1, order.total_price],
+    }
+    product_deltas = {}
+    if 'cancelled' in (old_status, new_status):
+        sign = -1 if new_status == 'cancelled' else 1
+        items = order.items.values_list('product_id', 'price', 'quantity')
+        product_deltas = _product_deltas(order, items, sign)
+    _apply_after_commit(seller_deltas, product_deltas)
+
+
+def rebuild_sales_rollup():
+    """
+    Полный пересчет сводки по истории заказов (агрегация на стороне базы).
+    Таблицы сводки блокируются от записи до конца пересчета, поэтому приращения
+    оформляемых в это время заказов ждут его завершения. Заказ, зафиксированный до
+    пересчета, но с еще не записанным приращением, будет учтен дважды - запускать,
+    когда оформление заказов остановлено или минимально.
+    """
+    seller_rows = Order.objects.annotate(day=TruncDate('created_at')).values(
+        'seller_id', 'day', 'status'
+    ).annotate(order_count=Count('id'), revenue=Sum('total_price')).order_by()
+
+    line_total = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    product_rows = OrderItem.objects.exclude(order__status='cancelled').annotate(
+        day=TruncDate('order__created_at')
+    ).values('order__seller_id', 'product_id', 'day').annotate(
+        units=Sum('quantity'), revenue=Sum(line_total)
+    ).order_by()
+
+    with transaction.atomic():
+        # EXCLUSIVE пропускает чтение сводки, но не INSERT ... ON CONFLICT из _apply_after_commit;
+        # порядок таблиц тот же, что у приращений
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {SellerSalesDay._meta.db_table}, {ProductSalesDay._meta.db_table} IN EXCLUSIVE MODE'
+            )
+        SellerSalesDay.objects.all().delete()
+        ProductSalesDay.objects.all().delete()
+        SellerSalesDay.objects.bulk_create(
+            (SellerSalesDay(**row) for row in seller_rows.iterator()), batch_size=REBUILD_BATCH_SIZE
+        )
+        ProductSalesDay.objects.bulk_create(
+            (
+                ProductSalesDay(
+                    seller_id=row['order__seller_id'], product_id=row['product_id'],
+                    day=row['day'], units=row['units'], revenue=row['revenue'],
+                )
+                for row in product_rows.iterator()
+            ),
+            batch_size=REBUILD_BATCH_SIZE
+        )
+    return SellerSalesDay.objects.count()
+
+
+# Чтение сводки
+
+def daily_revenue(seller, days=7):
+    """Выручка продавца по дням за последние days дней, включая сегодня: [(день, сумма), ...]"""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    totals = dict(
+        SellerSalesDay.objects.filter(
+            seller=seller, day__gte=start, day__lte=end, status__in=REVENUE_STATUSES
+        ).values('day').annotate(total=Sum('revenue')).values_list('day', 'total')
+    )
+    return [(start + timedelta(days=i), totals.get(start + timedelta(days=i), Decimal('0'))) for i in range(days)]
+
+
+def completed_totals(seller):
+    """Выручка и количество выполненных заказов продавца одним запросом"""
+    totals = SellerSalesDay.objects.filter(seller=seller, status='completed').aggregate(
+        revenue=Sum('revenue'), order_count=Sum('order_count')
+    )
+    return totals['revenue'] or 0, totals['order_count'] or 0
+
+
+def with_period_sales(products, days=30):
+    """Аннотация period_units - продано единиц за последние days дней (по сводке)"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    units = ProductSalesDay.objects.filter(product=OuterRef('pk'), day__gte=since).values(
+        'product'
+    ).annotate(total=Sum('units')).values('total')
+    return products.annotate(period_units=Coalesce(Subquery(units), Value(0)))
+
+
+def top_products(seller, days=30, limit=3):
+    """Популярные товары продавца: по продажам за период, затем за все время"""
+    return with_period_sales(seller.products.for_cards(), days).order_by('-period_units', '-sold_units', '-id')[:limit]
+
+
+def sellers_period_stats(start, end):
+    """
+    Статистика всех продавцов за дни [start, end) одним запросом:
+    {seller_id: {'by_status': {статус: заказов}, 'revenue': выручка без отмененных}}
+    """
+    stats = defaultdict(lambda: {'by_status': {}, 'revenue': Decimal('0')})
+    rows = SellerSalesDay.objects.filter(day__gte=start, day__lt=end).values('seller_id', 'status').annotate(
+        count=Sum('order_count'), total=Sum('revenue')
+    ).values_list('seller_id', 'status', 'count', 'total').order_by()
+    for seller_id, status, count, total in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        if not count:
+            continue
+        seller = stats[seller_id]
+        seller['by_status'][status] = count
+        if status in REVENUE_STATUSES:
+            seller['revenue'] += total
+    return dict(stats)
+
+
+def sellers_top_products(start, end, limit=5):
+    """
+    Топ товаров каждого продавца за дни [start, end) по проданным единицам одним запросом
+    (ROW_NUMBER по продавцу): {seller_id: [{'name', 'quantity_sold', 'revenue'}, ...]}
+    """
+    rows = ProductSalesDay.objects.filter(day__gte=start, day__lt=end).values(
+        'seller_id', 'product_id', name=F('product__name')
+    ).annotate(
+        quantity_sold=Sum('units'),
+        total=Sum('revenue'),
+        rank=Window(
+            RowNumber(), partition_by=F('seller_id'),
+            order_by=[F('quantity_sold').desc(), F('product_id').asc()]
+        ),
+    ).filter(quantity_sold__gt=0, rank__lte=limit).order_by('seller_id', 'rank')
+
+    top = defaultdict(list)
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        top[row['seller_id']].append({
+            'name': row['name'],
+            'quantity_sold': row['quantity_sold'],
+            'revenue': row['total'],
+        })
+    return dict(top)
@@ -0,0 +1,135 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import SellerSalesDay
+from .rollup import sellers_period_stats, sellers_top_products
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+SEND_BATCH_SIZE = 200
+# Рендеринг в потоках: воркеры Celery (prefork) не могут порождать дочерние процессы
+RENDER_WORKERS = 4
+MAX_SEND_ATTEMPTS = 3
+RETRY_DELAY = 5
+
+
+def report_period(today=None):
+    """Прошлая неделя: дни [start, end), end - сегодня"""
+    end = today or timezone.localdate()
+    return end - timedelta(days=7), end
+
+
+def _report_contexts(start, end):
+    """Контексты писем для продавцов с заказами за период: три запроса на всех продавцов"""
+    stats = sellers_period_stats(start, end)
+    top = sellers_top_products(start, end)
+    dashboard_url = f'https://{Site.objects.get_current().domain}{reverse("seller_dashboard")}'
+    last_day = end - timedelta(days=1)
+
+    sellers = User.objects.filter(
+        role='seller', pk__in=SellerSalesDay.objects.filter(day__gte=start, day__lt=end).values('seller_id')
+    ).exclude(email='').only('id', 'email', 'username', 'first_name', 'last_name').order_by('id')
+
+    for seller in sellers.iterator(chunk_size=SEND_BATCH_SIZE):
+        seller_stats = stats.get(seller.pk)
+        if seller_stats is None:
+            continue
+        by_status = seller_stats['by_status']
+        yield seller.email, {
+            'seller_name': seller.get_full_name() or seller.username,
+            'start_date': start.strftime('%d.%m.%Y'),
+            'end_date': last_day.strftime('%d.%m.%Y'),
+            'total_orders': sum(by_status.values()),
+            'total_revenue': seller_stats['revenue'],
+            'completed_orders': by_status.get('completed', 0),
+            'new_orders': by_status.get('new', 0),
+            'processing_orders': by_status.get('processing', 0),
+            'top_products': top.get(seller.pk, []),
+            'dashboard_url': dashboard_url,
+        }
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _send_batch(connection, messages):
+    """
+    Отправка пачки через уже открытое соединение. Письма передаются по одному, чтобы
+    при сбое повторять только неотправленные; возвращает неотправленные письма.
+    """
+    failed = []
+    for message in messages:
+        try:
+            connection.send_messages([message])
+        except Exception:
+            logger.warning('Не удалось отправить отчет о продажах на %s', message.to, exc_info=True)
+            failed.append(message)
+    return failed
+
+
+def _send_with_retries(connection, messages):
+    """Пачка с повторами неотправленных писем; соединение переоткрывается перед повтором"""
+    for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+        messages = _send_batch(connection, messages)
+        if not messages or attempt == MAX_SEND_ATTEMPTS:
+            break
+        time.sleep(RETRY_DELAY * attempt)
+        connection.close()
+        try:
+            connection.open()
+        except Exception:
+            # Следующая попытка откроет соединение заново в send_messages
+            logger.warning('Не удалось переоткрыть почтовое соединение', exc_info=True)
+    for message in messages:
+        logger.error('Отчет о продажах на %s не отправлен после %s попыток', message.to, MAX_SEND_ATTEMPTS)
+    return messages
+
+
+def send_sales_reports(today=None):
+    """
+    Еженедельные отчеты продавцам: статистика и топ-5 товаров всех продавцов из дневной
+    сводки несколькими групповыми запросами, письма рендерятся в пуле потоков и уходят
+    пачками по SEND_BATCH_SIZE через одно SMTP-соединение. Возвращает число отправленных писем.
+    """
+    start, end = report_period(today)
+    subject = f'Отчет о продажах за неделю {start.strftime("%d.%m.%Y")} - {(end - timedelta(days=1)).strftime("%d.%m.%Y")}'
+    html_template = get_template('emails/sales_report.html')
+    text_template = get_template('emails/sales_report.txt')
+
+    def build(report):
+        email, context = report
+        message = EmailMultiAlternatives(subject, text_template.render(context), settings.DEFAULT_FROM_EMAIL, [email])
+        message.attach_alternative(html_template.render(context), 'text/html')
+        return message
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        with ThreadPoolExecutor(max_workers=RENDER_WORKERS) as pool:
+            for reports in _batches(_report_contexts(start, end), SEND_BATCH_SIZE):
+                messages = list(pool.map(build, reports))
+                sent += len(messages) - len(_send_with_retries(connection, messages))
+    finally:
+        connection.close()
+    return sent
@@ -1,68 +1,90 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.db import transaction
 from .models import Order, OrderStatus
-from apps.notifications.models import Notification
+from apps.notifications.outbox import outbox_handler, publish
+from apps.products.homepage import invalidate_home_sections
 from django.urls import reverse
 
 @receiver(post_save, sender=Order)
-def create_order_notification(sender, instance, created, **kwargs):
-    """Создание уведомления при создании заказа"""
+def publish_order_created(sender, instance, created, **kwargs):
+    """Событие о новом заказе; уведомления рассылаются из outbox"""
     if created:
-        # Уведомление для покупателя
-        Notification.objects.create(
-            user=instance.buyer,
-            notification_type='order_status',
-            title=f'Заказ #{instance.id} оформлен',
-            message=f'Спасибо за заказ! Продавец скоро свяжется с вами.',
-            link=reverse('order_detail', args=[instance.id])
-        )
-        
-        # Уведомление для продавца
-        Notification.objects.create(
-            user=instance.seller,
-            notification_type='order_status',
-            title=f'Новый заказ #{instance.id}',
-            message=f'Покупатель {instance.buyer.username} оформил новый заказ.',
-            link=reverse('seller_order_detail', args=[instance.id])
-        )
+        publish('order.created', order_id=instance.id)
 
 @receiver(post_save, sender=OrderStatus)
-def order_status_notification(sender, instance, created, **kwargs):
-    """Отправка уведомлений при изменении статуса заказа"""
+def publish_order_status(sender, instance, created, **kwargs):
+    """Событие об изменении статуса заказа"""
     if created:
-        order = instance.order
-        
-        # Определяем получателя уведомления
-        if instance.created_by == order.buyer:
-            recipient = order.seller
-        else:
-            recipient = order.buyer
-        
-        # Формируем текст уведомления в зависимости от статуса
-        if instance.status == 'new':
-            title = f'Заказ #{order.id} оформлен'
-            message = 'Заказ успешно оформлен и ожидает обработки.'
-        elif instance.status == 'processing':
-            title = f'Заказ #{order.id} в обработке'
-            message = 'Ваш заказ принят и находится в обработке.'
-        elif instance.status == 'shipped':
-            title = f'Заказ #{order.id} отправлен'
-            message = f'Ваш заказ отправлен. {instance.comment if instance.comment else ""}'
-        elif instance.status == 'completed':
-            title = f'Заказ #{order.id} выполнен'
-            message = 'Ваш заказ успешно выполнен. Спасибо за покупку!'
-        elif instance.status == 'cancelled':
-            title = f'Заказ #{order.id} отменён'
-            message = f'Заказ был отменён. {instance.comment if instance.comment else ""}'
-        else:
-            title = f'Обновление статуса заказа #{order.id}'
-            message = f'Статус заказа изменен на "{instance.status}".'
-        
-        # Создаем уведомление
-        Notification.objects.create(
-            user=recipient,
-            notification_type='order_status',
-            title=title,
-            message=message,
-            link=reverse('order_detail', args=[order.id]) if recipient == order.buyer else reverse('seller_order_detail', args=[order.id])
-        )
\ No newline at end of file
+        publish('order.status_changed', order_status_id=instance.id)
+
+@outbox_handler('order.created')
+def order_created_notifications(payload):
+    """Уведомления покупателю и продавцу о новом заказе"""
+    order = Order.objects.select_related('buyer').filter(pk=payload['order_id']).first()
+    if order is None:
+        return []
+    return [
+        {
+            'user_id': order.buyer_id,
+            'notification_type': 'order_status',
+            'title': f'Заказ #{order.id} оформлен',
+            'message': 'Спасибо за заказ! Продавец скоро свяжется с вами.',
+            'link': reverse('order_detail', args=[order.id]),
+        },
+        {
+            'user_id': order.seller_id,
+            'notification_type': 'order_status',
+            'title': f'Новый заказ #{order.id}',
+            'message': f'Покупатель {order.buyer.username} оформил новый заказ.',
+            'link': reverse('seller_order_detail', args=[order.id]),
+        },
+    ]
+
+@outbox_handler('order.status_changed')
+def order_status_notifications(payload):
+    """Уведомление второй стороны заказа об изменении статуса"""
+    status_update = OrderStatus.objects.select_related('order').filter(pk=payload['order_status_id']).first()
+    if status_update is None:
+        return []
+    order = status_update.order
+    
+    # Определяем получателя уведомления
+    if status_update.created_by_id == order.buyer_id:
+        recipient_id = order.seller_id
+    else:
+        recipient_id = order.buyer_id
+    
+    # Формируем текст уведомления в зависимости от статуса
+    comment = status_update.comment if status_update.comment else ""
+    if status_update.status == 'new':
+        title = f'Заказ #{order.id} оформлен'
+        message = 'Заказ успешно оформлен и ожидает обработки.'
+    elif status_update.status == 'processing':
+        title = f'Заказ #{order.id} в обработке'
+        message = 'Ваш заказ принят и находится в обработке.'
+    elif status_update.status == 'shipped':
+        title = f'Заказ #{order.id} отправлен'
+        message = f'Ваш заказ отправлен. {comment}'
+    elif status_update.status == 'completed':
+        title = f'Заказ #{order.id} выполнен'
+        message = 'Ваш заказ успешно выполнен. Спасибо за покупку!'
+    elif status_update.status == 'cancelled':
+        title = f'Заказ #{order.id} отменён'
+        message = f'Заказ был отменён. {comment}'
+    else:
+        title = f'Обновление статуса заказа #{order.id}'
+        message = f'Статус заказа изменен на "{status_update.status}".'
+    
+    return [{
+        'user_id': recipient_id,
+        'notification_type': 'order_status',
+        'title': title,
+        'message': message,
+        'link': reverse('order_detail', args=[order.id]) if recipient_id == order.buyer_id else reverse('seller_order_detail', args=[order.id]),
+    }]
+
+@receiver(post_save, sender=Order)
+def home_sections_order_update(sender, instance, **kwargs):
+    """Новый или отмененный заказ меняет счетчики продаж - обновляем хиты продаж"""
+    transaction.on_commit(lambda: invalidate_home_sections('best_selling'))
@@ -5,34 +5,37 @@ from django.http import JsonResponse
 from django.db import transaction
 from django.utils import timezone
 
-from .models import Order, OrderItem, OrderStatus
-from apps.products.models import Cart, CartItem, Product
+from .models import Order, OrderStatus
+from .checkout import InsufficientStock, check_stock, get_checkout_items, group_by_seller, place_orders, restore_stock
+from .reservations import reserve_cart
+from .flash_sale import admit_flash_order
+from .tasks import process_flash_orders
+from apps.products.models import Cart, Product
+from apps.products.pagination import cursor_paginate
+from apps.products.sales import record_order_status_change
 from apps.accounts.models import Address
 from .forms import OrderForm
 
 @login_required
 def checkout(request):
     cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = CartItem.objects.filter(cart=cart)
+    cart_items = get_checkout_items(request.user)
     
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, 'Ваша корзина пуста. Добавьте товары перед оформлением заказа.')
         return redirect('cart')
     
+    # Резервируем товары на время оформления заказа
+    try:
+        reservation_expires_at = reserve_cart(
+            request.user, [item for item in cart_items if not item.product.flash_sale]
+        )
+    except InsufficientStock as e:
+        messages.error(request, f'К сожалению, товара "{e.product.name}" осталось только {e.available} шт.')
+        return redirect('cart')
+    
     # Группируем товары по продавцу
-    sellers_products = {}
-    for item in cart_items:
-        seller = item.product.seller
-        if seller not in sellers_products:
-            sellers_products[seller] = []
-        sellers_products[seller].append(item)
-    
-    # Проверяем наличие товаров
-    for items in sellers_products.values():
-        for item in items:
-            if item.quantity > item.product.stock:
-                messages.error(request, f'К сожалению, товара "{item.product.name}" осталось только {item.product.stock} шт.')
-                return redirect('cart')
+    sellers_products = group_by_seller(cart_items)
     
     # Получаем адреса пользователя
     addresses = Address.objects.filter(user=request.user)
@@ -43,20 +46,19 @@ def checkout(request):
         'sellers_products': sellers_products,
         'addresses': addresses,
         'default_address': default_address,
+        'reservation_expires_at': reservation_expires_at,
         'form': OrderForm(initial={'address': default_address.id} if default_address else None)
     }
     return render(request, 'orders/checkout.html', context)
 
 @login_required
-@transaction.atomic
 def place_order(request):
     if request.method != 'POST':
         return redirect('checkout')
     
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = CartItem.objects.filter(cart=cart)
+    cart_items = get_checkout_items(request.user)
     
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, 'Ваша корзина пуста.')
         return redirect('cart')
     
@@ -65,79 +67,33 @@ def place_order(request):
         messages.error(request, 'Пожалуйста, исправьте ошибки в форме.')
         return redirect('checkout')
     
-    # Получаем данные из формы
-    full_name = form.cleaned_data['full_name']
-    email = form.cleaned_data['email']
-    phone = form.cleaned_data['phone']
-    address_line = form.cleaned_data['address_line']
-    city = form.cleaned_data['city']
-    postal_code = form.cleaned_data['postal_code']
-    comment = form.cleaned_data['comment']
+    flash_items = [item for item in cart_items if item.product.flash_sale]
+    cart_items = [item for item in cart_items if not item.product.flash_sale]
     
-    # Группируем товары по продавцу
-    sellers_products = {}
-    for item in cart_items:
-        seller = item.product.seller
-        if seller not in sellers_products:
-            sellers_products[seller] = []
-        sellers_products[seller].append(item)
-    
-    orders = []
-    
-    # Создаем заказы для каждого продавца
-    for seller, items in sellers_products.items():
-        # Проверяем наличие товаров
-        for item in items:
-            if item.quantity > item.product.stock:
-                messages.error(request, f'К сожалению, товара "{item.product.name}" осталось только {item.product.stock} шт.')
-                return redirect('cart')
-        
-        # Рассчитываем общую стоимость
-        total_price = sum(item.product.price * item.quantity for item in items)
-        
-        # Создаем заказ
-        order = Order.objects.create(
-            buyer=request.user,
-            seller=seller,
-            full_name=full_name,
-            email=email,
-            phone=phone,
-            address=address_line,
-            city=city,
-            postal_code=postal_code,
-            status='new',
-            total_price=total_price,
-            comment=comment
-        )
-        
-        # Создаем элементы заказа и обновляем остаток товара
-        for item in items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                price=item.product.price,
-                quantity=item.quantity
-            )
-            
-            # Обновляем остаток товара
-            product = item.product
-            product.stock -= item.quantity
-            if product.stock == 0:
-                product.status = 'out_of_stock'
-            product.save()
-        
-        # Создаем запись о статусе заказа
-        OrderStatus.objects.create(
-            order=order,
-            status='new',
-            comment='Заказ создан',
-            created_by=request.user
-        )
-        
-        orders.append(order)
+    # Товары распродажи принимаются через очередь отдельно от обычных: в смешанной корзине
+    # часть заказа могла бы быть принята, а остальное - отклонено
+    if flash_items and cart_items:
+        messages.error(request, 'Товары распродажи оформляются отдельным заказом. Оставьте в корзине только их или только обычные товары.')
+        return redirect('cart')
     
-    # Очищаем корзину
-    cart_items.delete()
+    # Товары распродажи принимаются через очередь и сохраняются в фоне
+    if flash_items:
+        try:
+            admit_flash_order(request.user, flash_items, form.cleaned_data)
+        except InsufficientStock as e:
+            messages.error(request, f'К сожалению, товара "{e.product.name}" осталось только {e.available} шт.')
+            return redirect('cart')
+        process_flash_orders.delay()
+        messages.success(request, 'Заказ на товары распродажи принят и будет оформлен в течение нескольких минут.')
+        return redirect('payment_success')
+    
+    # Проверяем наличие до транзакции, окончательно остаток списывается атомарно
+    try:
+        check_stock(cart_items)
+        orders = place_orders(request.user, cart_items, form.cleaned_data)
+    except InsufficientStock as e:
+        messages.error(request, f'К сожалению, товара "{e.product.name}" осталось только {e.available} шт.')
+        return redirect('cart')
     
     messages.success(request, f'Ваш заказ успешно оформлен! Номер заказа: {", ".join(str(order.id) for order in orders)}')
     return redirect('payment_success')
@@ -148,10 +104,13 @@ def payment_success(request):
     recent_orders = Order.objects.filter(buyer=request.user).order_by('-created_at')[:5]
     return render(request, 'orders/payment_success.html', {'orders': recent_orders})
 
+ORDERS_PER_PAGE = 10
+
 @login_required
 def my_orders(request):
-    orders = Order.objects.filter(buyer=request.user).order_by('-created_at')
-    return render(request, 'orders/my_orders.html', {'orders': orders})
+    orders = Order.objects.filter(buyer=request.user).select_related('seller')
+    page = cursor_paginate(request, orders, ('-created_at', '-id'), ORDERS_PER_PAGE)
+    return render(request, 'orders/my_orders.html', {'orders': page})
 
 @login_required
 def order_detail(request, order_id):
@@ -170,10 +129,17 @@ def cancel_order(request, order_id):
     
     if request.method == 'POST':
         with transaction.atomic():
+            # Блокируем заказ: повторная отправка формы не должна вернуть товары дважды
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            old_status = order.status
+            if old_status not in ['new', 'processing']:
+                messages.error(request, 'Этот заказ нельзя отменить. Обратитесь к продавцу.')
+                return redirect('order_detail', order_id=order.id)
+
             # Обновляем статус заказа
             order.status = 'cancelled'
-            order.save()
-            
+            order.save(update_fields=['status', 'updated_at'])
+
             # Создаем запись о статусе заказа
             OrderStatus.objects.create(
                 order=order,
@@ -181,15 +147,12 @@ def cancel_order(request, order_id):
                 comment=request.POST.get('comment', 'Заказ отменен покупателем'),
                 created_by=request.user
             )
-            
+
             # Возвращаем товары в наличие
-            for item in order.items.all():
-                product = item.product
-                product.stock += item.quantity
-                if product.stock > 0 and product.status == 'out_of_stock':
-                    product.status = 'active'
-                product.save()
-        
+            restore_stock(order.items.values_list('product_id', 'quantity'))
+
+            record_order_status_change(order, old_status, order.status)
+
         messages.success(request, 'Заказ успешно отменен.')
         return redirect('my_orders')
     
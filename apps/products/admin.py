@@ -1,4 +1,10 @@
-from django.contrib import admin
+from decimal import Decimal
+
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.template.response import TemplateResponse
+from .bulk import bulk_update_products
+from .forms import BulkProductActionForm
 from .models import (
     Category, Product, ProductImage, ProductVideo, ProductAttribute,
     Review, ReviewImage, Cart, CartItem, Wishlist, ProductTracking
@@ -24,12 +30,13 @@ class ProductAttributeInline(admin.TabularInline):
 
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'status', 'created_at')
-    list_filter = ('category', 'status', 'created_at')
+    list_filter = ('category', 'status', 'flash_sale', 'created_at')
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductImageInline, ProductVideoInline, ProductAttributeInline]
     readonly_fields = ('created_at', 'updated_at')
     list_editable = ('price', 'stock', 'status')
+    actions = ['bulk_update_prices']
     fieldsets = (
         (None, {
             'fields': ('seller', 'category', 'name', 'slug', 'description')
@@ -38,13 +45,50 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price', 'old_price')
         }),
         ('Информация о наличии', {
-            'fields': ('stock', 'status')
+            'fields': ('stock', 'status', 'flash_sale')
         }),
         ('Даты', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    @admin.action(description='Изменить цены и остатки выбранных товаров')
+    def bulk_update_prices(self, request, queryset):
+        """Массовое изменение через bulk_update_products: несколько UPDATE и события в outbox одним INSERT"""
+        form = BulkProductActionForm(request.POST if 'apply' in request.POST else None)
+        if not form.is_valid():
+            return TemplateResponse(request, 'admin/products/product/bulk_update.html', {
+                **self.admin_site.each_context(request),
+                'title': 'Изменение цен и остатков',
+                'form': form,
+                'products': queryset.only('id'),
+                'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            })
+        
+        data = form.cleaned_data
+        rows = []
+        for product_id, price, old_price in queryset.values_list('id', 'price', 'old_price'):
+            row = {'id': product_id}
+            if data['price_change_percent'] is not None:
+                row['price'] = (price * (100 + data['price_change_percent']) / 100).quantize(Decimal('0.01'))
+                if data['keep_old_price'] and row['price'] < price:
+                    row['old_price'] = price
+                elif old_price is not None and row['price'] >= old_price:
+                    # Старая цена не выше новой - скидки больше нет
+                    row['old_price'] = None
+            if data['stock'] is not None:
+                row['stock'] = data['stock']
+            if data['status']:
+                row['status'] = data['status']
+            rows.append(row)
+        
+        results = bulk_update_products(rows)
+        updated = sum(1 for result in results if result['result'] == 'updated')
+        invalid = [result for result in results if result['result'] == 'invalid']
+        self.message_user(request, f'Обновлено товаров: {updated} из {len(rows)}', messages.SUCCESS)
+        if invalid:
+            self.message_user(request, f'Не обновлено из-за ошибок: {len(invalid)} (например, товар #{invalid[0]["id"]}: {invalid[0]["errors"]})', messages.WARNING)
 
 class ReviewImageInline(admin.TabularInline):
     model = ReviewImage
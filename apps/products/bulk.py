@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import Case, CharField, DecimalField, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .forms import BulkProductRowForm
+from .homepage import invalidate_home_sections
+from .models import Product
+from apps.notifications.outbox import publish_many
+
+MAX_BULK_ROWS = 5000
+UPDATE_CHUNK_SIZE = 1000
+
+BULK_FIELDS = {
+    'price': DecimalField(max_digits=10, decimal_places=2),
+    'old_price': DecimalField(max_digits=10, decimal_places=2),
+    'stock': IntegerField(),
+    'status': CharField(),
+}
+
+
+def _discount_percentage(price, old_price):
+    return int(100 - (price * 100 / old_price)) if old_price else 0
+
+
+def product_change_payload(product_id, old, new):
+    """
+    Событие 'product.changed' для отслеживающих товар по прежним и новым значениям
+    (словари price, old_price, stock); None, если уведомлять не о чем
+    """
+    price_changed = old['price'] != new['price']
+    back_in_stock = old['stock'] <= 0 and new['stock'] > 0
+    discount_added = bool(
+        (not old['old_price'] or old['price'] == old['old_price'])
+        and new['old_price'] and new['price'] < new['old_price']
+    )
+    if not (price_changed or back_in_stock or discount_added):
+        return None
+    return {
+        'product_id': product_id,
+        'price_changed': price_changed,
+        'price_dropped': bool(new['old_price'] and new['price'] < new['old_price']),
+        'back_in_stock': back_in_stock,
+        'discount_added': discount_added,
+        'price': str(new['price']),
+        'old_price': str(new['old_price']) if new['old_price'] else None,
+        'stock': new['stock'],
+        'discount_percentage': _discount_percentage(new['price'], new['old_price']),
+    }
+
+
+def _validate(rows):
+    """Проверка строк формой; возвращает ({id: изменения}, {индекс строки: результат с ошибкой})"""
+    changes = {}
+    errors = {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = {'row': index, 'result': 'invalid', 'errors': {'__all__': ['Ожидается объект']}}
+            continue
+        form = BulkProductRowForm(row)
+        if not form.is_valid():
+            errors[index] = {
+                'row': index, 'id': row.get('id'), 'result': 'invalid',
+                'errors': {field: list(messages) for field, messages in form.errors.items()},
+            }
+            continue
+        product_id = form.cleaned_data.pop('id')
+        if product_id in changes:
+            errors[index] = {'row': index, 'id': product_id, 'result': 'invalid', 'errors': {'id': ['Товар повторяется']}}
+            continue
+        changes[product_id] = form.cleaned_data
+    return changes, errors
+
+
+def _apply(chunk, now):
+    """Один UPDATE на пачку: для каждого поля CASE по id, остальные строки сохраняют значение"""
+    updates = {}
+    for field, output_field in BULK_FIELDS.items():
+        whens = [
+            When(pk=product_id, then=Value(values[field], output_field=output_field))
+            for product_id, values in chunk if field in values
+        ]
+        if whens:
+            updates[field] = Case(*whens, default=F(field), output_field=output_field)
+    Product.objects.filter(pk__in=[product_id for product_id, _ in chunk]).update(updated_at=now, **updates)
+
+
+def bulk_update_products(rows, seller=None):
+    """
+    Массовое обновление цены, старой цены, количества и статуса товаров.
+    rows - список словарей {'id', ['price'], ['old_price'], ['stock'], ['status']};
+    seller ограничивает обновление его товарами. Строки товаров блокируются по
+    возрастанию id, изменения применяются UPDATE пачками по UPDATE_CHUNK_SIZE,
+    события для отслеживающих записываются в outbox одним INSERT.
+    Возвращает результаты в порядке строк: updated, unchanged, not_found или invalid с ошибками.
+    """
+    changes, errors = _validate(rows)
+
+    with transaction.atomic():
+        products = Product.objects.select_for_update().filter(pk__in=changes).order_by('pk')
+        if seller is not None:
+            products = products.filter(seller=seller)
+        current = {
+            row['id']: row
+            for row in products.values('id', *BULK_FIELDS)
+        }
+
+        changed = []
+        payloads = []
+        for product_id, values in changes.items():
+            old = current.get(product_id)
+            if old is None:
+                continue
+            values = {field: value for field, value in values.items() if old[field] != value}
+            if not values:
+                continue
+            changed.append((product_id, values))
+            payload = product_change_payload(product_id, old, {**old, **values})
+            if payload is not None:
+                payloads.append(payload)
+
+        now = timezone.now()
+        for start in range(0, len(changed), UPDATE_CHUNK_SIZE):
+            _apply(changed[start:start + UPDATE_CHUNK_SIZE], now)
+        publish_many('product.changed', payloads)
+        if changed:
+            transaction.on_commit(lambda: invalidate_home_sections('featured_products', 'best_selling', 'top_rated'))
+
+    changed_ids = {product_id for product_id, _ in changed}
+    results = []
+    valid_index = iter(changes)
+    for index in range(len(rows)):
+        if index in errors:
+            results.append(errors[index])
+            continue
+        product_id = next(valid_index)
+        if product_id not in current:
+            result = 'not_found'
+        elif product_id in changed_ids:
+            result = 'updated'
+        else:
+            result = 'unchanged'
+        results.append({'row': index, 'id': product_id, 'result': result})
+    return results
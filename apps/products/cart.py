@@ -0,0 +1,136 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import Cart, CartItem
+from .membership import invalidate_product_ids
+
+ANONYMOUS_CART_TIMEOUT = 30 * 24 * 60 * 60
+ANONYMOUS_CART_SESSION_KEY = 'anonymous_cart_id'
+
+
+def _line_total():
+    return ExpressionWrapper(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def get_cart_id(user):
+    """id корзины пользователя: вставка или существующая строка одним запросом"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Cart._meta.db_table} (user_id, created_at, updated_at) VALUES (%s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET updated_at = EXCLUDED.updated_at
+            RETURNING id
+            """,
+            [user.pk, timezone.now(), timezone.now()]
+        )
+        return cursor.fetchone()[0]
+
+
+def add_item(user, product_id, quantity, limit):
+    """
+    Атомарное добавление товара: новая позиция или увеличение количества одним
+    INSERT ... ON CONFLICT. Итоговое количество не превышает limit, иначе позиция
+    не меняется и возвращается None; при успехе - новое количество.
+    """
+    with transaction.atomic():
+        cart_id = get_cart_id(user)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {CartItem._meta.db_table} AS item (cart_id, product_id, quantity)
+                SELECT %s, %s, %s WHERE %s <= %s
+                ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = item.quantity + EXCLUDED.quantity
+                WHERE item.quantity + EXCLUDED.quantity <= %s
+                RETURNING quantity
+                """,
+                [cart_id, product_id, quantity, quantity, limit, limit]
+            )
+            row = cursor.fetchone()
+    invalidate_product_ids('cart', user.pk)
+    return row[0] if row else None
+
+
+def set_quantity(item_id, quantity):
+    """Новое количество позиции без повторного чтения строки"""
+    return CartItem.objects.filter(pk=item_id).update(quantity=quantity)
+
+
+def cart_summary(user, item_id=None):
+    """Сумма корзины, количество позиций и единиц (и подытог позиции item_id) одним запросом"""
+    aggregates = {
+        'total': Sum(_line_total()),
+        'item_count': Count('id'),
+        'units': Sum('quantity'),
+    }
+    if item_id is not None:
+        aggregates['subtotal'] = Sum(_line_total(), filter=Q(pk=item_id))
+    summary = CartItem.objects.filter(cart__user=user).aggregate(**aggregates)
+    return {key: value or 0 for key, value in summary.items()}
+
+
+def summary_json(summary):
+    """Краткое представление корзины для main.js (суммы - строками, как в шаблонах)"""
+    data = {
+        'status': 'success',
+        'total': str(summary['total']),
+        'item_count': summary['item_count'],
+        'units': summary['units'],
+    }
+    if 'subtotal' in summary:
+        data['subtotal'] = str(summary['subtotal'])
+    return data
+
+
+# Корзина анонимного пользователя: {product_id: quantity} в кэше под id из сессии
+
+def _anonymous_cart_key(cart_id):
+    return f'anonymous_cart:{cart_id}'
+
+
+def anonymous_carts_enabled():
+    return settings.ANONYMOUS_CART_ENABLED
+
+
+def get_anonymous_cart(request):
+    cart_id = request.session.get(ANONYMOUS_CART_SESSION_KEY)
+    if not cart_id:
+        return {}
+    return cache.get(_anonymous_cart_key(cart_id)) or {}
+
+
+def add_anonymous_item(request, product_id, quantity, limit):
+    """Добавление в анонимную корзину; возвращает новое количество или None, если превышен limit"""
+    cart_id = request.session.get(ANONYMOUS_CART_SESSION_KEY)
+    if not cart_id:
+        cart_id = request.session[ANONYMOUS_CART_SESSION_KEY] = uuid.uuid4().hex
+    items = get_anonymous_cart(request)
+    new_quantity = items.get(product_id, 0) + quantity
+    if new_quantity > limit:
+        return None
+    items[product_id] = new_quantity
+    cache.set(_anonymous_cart_key(cart_id), items, ANONYMOUS_CART_TIMEOUT)
+    return new_quantity
+
+
+def merge_anonymous_cart(request, user, limits):
+    """
+    Перенос анонимной корзины в корзину пользователя после входа.
+    limits(product_ids) -> {product_id: доступный остаток}; позиции сверх остатка пропускаются.
+    """
+    cart_id = request.session.pop(ANONYMOUS_CART_SESSION_KEY, None)
+    if not cart_id:
+        return 0
+    items = cache.get(_anonymous_cart_key(cart_id)) or {}
+    cache.delete(_anonymous_cart_key(cart_id))
+
+    available = limits(list(items)) if items else {}
+    merged = 0
+    for product_id, quantity in items.items():
+        if product_id in available and add_item(user, product_id, quantity, available[product_id]) is not None:
+            merged += 1
+    return merged
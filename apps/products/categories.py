@@ -0,0 +1,109 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import Category
+
+VERSION_CACHE_KEY = 'category_tree:version'
+
+
+class CategoryNode:
+    """Узел дерева категорий (неизменяемый после построения, общий для всех запросов процесса)"""
+
+    def __init__(self, id, name, slug, parent_id, image):
+        self.id = id
+        self.pk = id
+        self.name = name
+        self.slug = slug
+        self.parent_id = parent_id
+        self.image = image
+        self.parent = None
+        self.children = []
+        # Материализованный путь: id предков от корня
+        self.path = ()
+        # id самой категории и всех вложенных
+        self.descendant_ids = frozenset()
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'<CategoryNode {self.slug}>'
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.nodes = {
+            row['id']: CategoryNode(row['id'], row['name'], row['slug'], row['parent_id'], row['image'])
+            for row in rows
+        }
+        self.by_slug = {node.slug: node for node in self.nodes.values()}
+        self.roots = []
+
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                node.parent = parent
+                parent.children.append(node)
+
+        # Обход от корней: путь и множества потомков (защита от циклов через visited)
+        visited = set()
+
+        def walk(node, path):
+            visited.add(node.id)
+            node.path = path
+            descendant_ids = {node.id}
+            for child in node.children:
+                if child.id not in visited:
+                    descendant_ids |= walk(child, path + (node.id,))
+            node.descendant_ids = frozenset(descendant_ids)
+            return descendant_ids
+
+        for root in self.roots:
+            walk(root, ())
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def get_by_slug(self, slug):
+        return self.by_slug.get(slug)
+
+
+_lock = threading.Lock()
+_loaded = {'version': None, 'tree': None}
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add() не перезапишет версию, уже выставленную другим процессом
+        if not cache.add(VERSION_CACHE_KEY, version, None):
+            version = cache.get(VERSION_CACHE_KEY, version)
+    return version
+
+
+def get_category_tree():
+    """Дерево категорий процесса; перестраивается только при смене версии в общем кэше"""
+    version = _current_version()
+    if _loaded['version'] != version:
+        with _lock:
+            if _loaded['version'] != version:
+                rows = Category.objects.order_by('id').values('id', 'name', 'slug', 'parent_id', 'image')
+                _loaded['tree'] = CategoryTree(rows)
+                _loaded['version'] = version
+    return _loaded['tree']
+
+
+def invalidate_category_tree():
+    """Новая версия дерева - все процессы перечитают категории при следующем обращении"""
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
@@ -0,0 +1,63 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Сильный ETag из значений, от которых зависит содержимое ответа"""
+    payload = '|'.join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(payload.encode(), usedforsecurity=False).hexdigest())
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else None
+
+
+def _has_pending_messages(request):
+    # Страница с flash-сообщениями всегда рендерится заново, иначе сообщения потеряются
+    storage = get_messages(request)
+    pending = any(True for _ in storage)
+    storage.used = False
+    return pending
+
+
+def set_validators(request, response, etag=None, last_modified=None):
+    """ETag/Last-Modified и Cache-Control, требующий перепроверки при каждом запросе"""
+    if etag and not response.has_header('ETag'):
+        response.headers['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(_timestamp(last_modified))
+
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """Ответ 304, если валидаторы запроса совпадают с текущими, иначе None"""
+    if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+        return None
+
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is None:
+        return None
+    return set_validators(request, response, etag, last_modified)
+
+
+def conditional_json(request, data, **kwargs):
+    """
+    JsonResponse с ETag по содержимому: вычисления не экономятся,
+    но клиент не скачивает повторно неизменившиеся данные.
+    """
+    response = JsonResponse(data, **kwargs)
+    if response.status_code != 200:
+        return response
+
+    etag = make_etag(response.content.decode())
+    return not_modified(request, etag) or set_validators(request, response, etag)
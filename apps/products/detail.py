@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Prefetch, Subquery, prefetch_related_objects
+
+from .models import Product, ProductImage, Review
+from .pagination import cursor_paginate
+
+REVIEWS_PER_PAGE = 10
+RELATED_PRODUCTS_LIMIT = 4
+
+# Запросы на подгрузку данных и рендеринг страницы товара: коллекции товара (3),
+# страница отзывов с фото (2), похожие товары (1), контекстные процессоры шаблона
+PRODUCT_DETAIL_QUERY_BUDGET = 16
+
+
+def product_detail_queryset():
+    """Товар с категорией, продавцом и данными для валидаторов условного GET - одним запросом"""
+    last_review_at = Review.objects.filter(product=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    related_updated_at = Product.objects.filter(
+        category=OuterRef('category')
+    ).order_by('-updated_at').values('updated_at')[:1]
+    return Product.objects.select_related('category', 'seller').annotate(
+        last_review_at=Subquery(last_review_at),
+        related_updated_at=Subquery(related_updated_at),
+    )
+
+
+def load_product_detail(request, product):
+    """
+    Данные страницы товара за фиксированное число запросов:
+    изображения, видео и атрибуты товара, страница отзывов с авторами и фото, похожие товары.
+    """
+    prefetch_related_objects(
+        [product],
+        Prefetch('images', queryset=ProductImage.objects.order_by('-is_main', 'id')),
+        'videos',
+        'attributes',
+    )
+
+    reviews = product.reviews.select_related('user').prefetch_related('images')
+    reviews_page = cursor_paginate(
+        request, reviews, ('-created_at', '-id'), REVIEWS_PER_PAGE, param='reviews_cursor'
+    )
+
+    related_products = list(
+        Product.objects.for_cards().filter(
+            category_id=product.category_id, status='active'
+        ).exclude(pk=product.pk).order_by('-sold_units', '-id')[:RELATED_PRODUCTS_LIMIT]
+    )
+
+    return {
+        'reviews': reviews_page,
+        'related_products': related_products,
+    }
+
+
+@contextmanager
+def query_budget(limit, label):
+    """Проверка, что блок выполняет не больше limit запросов (включается QUERY_BUDGET_ENFORCED)"""
+    if not settings.QUERY_BUDGET_ENFORCED:
+        yield
+        return
+
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        yield
+    assert len(queries) <= limit, f'{label}: {len(queries)} запросов при бюджете {limit}'
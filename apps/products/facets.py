@@ -0,0 +1,94 @@
+from django.db.models import Count, Q
+
+from .models import ProductAttribute
+from .categories import get_category_tree
+
+# Границы ценовых диапазонов (₸), последний диапазон открыт сверху
+PRICE_BOUNDS = (0, 5000, 10000, 25000, 50000, 100000, 250000)
+ATTRIBUTE_FACETS_LIMIT = 20
+
+
+def catalog_filters(category=None, min_price=None, max_price=None):
+    """Условия фильтрации каталога по категории (вместе с подкатегориями) и по цене"""
+    category_filter = Q(category_id__in=category.descendant_ids) if category else Q()
+
+    price_filter = Q()
+    if min_price is not None:
+        price_filter &= Q(price__gte=min_price)
+    if max_price is not None:
+        price_filter &= Q(price__lte=max_price)
+
+    return category_filter, price_filter
+
+
+def _price_ranges(bucket_counts):
+    ranges = []
+    for index, count in enumerate(bucket_counts):
+        upper = PRICE_BOUNDS[index + 1] if index + 1 < len(PRICE_BOUNDS) else None
+        ranges.append({'min': PRICE_BOUNDS[index], 'max': upper, 'count': count})
+    return ranges
+
+
+def _database_counts(queryset, category_filter, price_filter):
+    """Количество по категориям и ценовым диапазонам - по одному сгруппированному запросу"""
+    category_rows = queryset.filter(price_filter).values('category_id').annotate(count=Count('id'))
+    category_counts = {row['category_id']: row['count'] for row in category_rows}
+
+    buckets = {}
+    for index, lower in enumerate(PRICE_BOUNDS):
+        bucket_filter = Q(price__gte=lower)
+        if index + 1 < len(PRICE_BOUNDS):
+            # Верхняя граница включается, как max_price в catalog_filters (ссылка диапазона)
+            bucket_filter &= Q(price__lte=PRICE_BOUNDS[index + 1])
+        buckets[f'bucket_{index}'] = Count('id', filter=bucket_filter)
+    totals = queryset.filter(category_filter).aggregate(**buckets)
+    bucket_counts = [totals[f'bucket_{index}'] for index in range(len(PRICE_BOUNDS))]
+
+    return category_counts, bucket_counts
+
+
+def get_catalog_facets(queryset, category=None, min_price=None, max_price=None, snapshot=None):
+    """
+    Фасеты каталога: категории, ценовые диапазоны и популярные атрибуты.
+    queryset - товары без фильтров по категории и цене; каждый фасет считается
+    со всеми фильтрами, кроме собственного.
+    """
+    category_filter, price_filter = catalog_filters(category, min_price, max_price)
+
+    if snapshot is not None:
+        category_counts, bucket_counts = snapshot.facet_counts(
+            PRICE_BOUNDS,
+            category_ids=category.descendant_ids if category else None,
+            min_price=min_price,
+            max_price=max_price,
+        )
+    else:
+        category_counts, bucket_counts = _database_counts(queryset, category_filter, price_filter)
+
+    # Количество для категории включает товары всех ее подкатегорий
+    category_facets = []
+    for node in get_category_tree():
+        count = sum(category_counts.get(category_id, 0) for category_id in node.descendant_ids)
+        if count:
+            category_facets.append({
+                'id': node.id,
+                'parent_id': node.parent_id,
+                'name': node.name,
+                'slug': node.slug,
+                'count': count,
+            })
+    category_facets.sort(key=lambda facet: (-facet['count'], facet['name']))
+
+    attribute_facets = list(
+        ProductAttribute.objects.filter(
+            product__in=queryset.filter(category_filter, price_filter).values('pk')
+        ).values('name', 'value').annotate(
+            count=Count('id')
+        ).order_by('-count', 'name', 'value')[:ATTRIBUTE_FACETS_LIMIT]
+    )
+
+    return {
+        'categories': category_facets,
+        'price_ranges': _price_ranges(bucket_counts),
+        'attributes': attribute_facets,
+    }
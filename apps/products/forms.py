@@ -20,6 +20,34 @@ class ProductForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 5}),
         }
 
+class BulkProductRowForm(forms.Form):
+    """Строка массового обновления товара; применяются только переданные поля"""
+    id = forms.IntegerField(min_value=1)
+    price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    old_price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = forms.IntegerField(min_value=0)
+    status = forms.ChoiceField(choices=Product.STATUS_CHOICES)
+    
+    def __init__(self, data, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        # Непереданные поля не обязательны и не меняются
+        for name in ('price', 'old_price', 'stock', 'status'):
+            if name not in data:
+                del self.fields[name]
+
+class BulkProductActionForm(forms.Form):
+    """Массовое изменение выбранных товаров в админке"""
+    price_change_percent = forms.DecimalField(
+        label='Изменить цену на, %', max_digits=5, decimal_places=2, min_value=-99, max_value=1000, required=False
+    )
+    keep_old_price = forms.BooleanField(
+        label='Сохранить текущую цену как старую (скидка)', required=False
+    )
+    stock = forms.IntegerField(label='Установить количество', min_value=0, required=False)
+    status = forms.ChoiceField(
+        label='Установить статус', choices=[('', '---------')] + list(Product.STATUS_CHOICES), required=False
+    )
+
 class ProductAttributeForm(forms.ModelForm):
     class Meta:
         model = ProductAttribute
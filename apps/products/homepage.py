@@ -0,0 +1,110 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Category, Product
+
+# Время жизни разделов главной страницы (секунды)
+HOME_SECTION_TTLS = {
+    'featured_products': 5 * 60,
+    'top_categories': 30 * 60,
+    'best_selling': 10 * 60,
+    'top_rated': 15 * 60,
+}
+
+# Сколько хранить устаревшее значение, чтобы отдавать его, пока один процесс пересчитывает раздел
+STALE_TTL = 10 * 60
+# Максимальное время пересчета раздела (время жизни блокировки)
+LOCK_TIMEOUT = 30
+# Ожидание чужого пересчета, если устаревшего значения нет
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+
+def _featured_products():
+    return Product.objects.for_cards().filter(status='active').order_by('-created_at', '-id')[:8]
+
+
+def _top_categories():
+    return Category.objects.annotate(product_count=Count('products')).order_by('-product_count', 'id')[:6]
+
+
+def _best_selling():
+    return Product.objects.for_cards().filter(status='active', sold_units__gt=0).order_by('-sold_units', '-id')[:8]
+
+
+def _top_rated():
+    return Product.objects.for_cards().filter(status='active', review_count__gt=0).order_by('-rating_avg', '-id')[:8]
+
+
+HOME_SECTION_BUILDERS = {
+    'featured_products': _featured_products,
+    'top_categories': _top_categories,
+    'best_selling': _best_selling,
+    'top_rated': _top_rated,
+}
+
+
+def _data_key(name):
+    return f'home_section:{name}'
+
+
+def _version_key(name):
+    return f'home_section:{name}:version'
+
+
+def _lock_key(name):
+    return f'home_section:{name}:lock'
+
+
+def _rebuild(name, version):
+    value = list(HOME_SECTION_BUILDERS[name]())
+    ttl = HOME_SECTION_TTLS[name]
+    entry = {'value': value, 'version': version, 'fresh_until': time.time() + ttl}
+    cache.set(_data_key(name), entry, ttl + STALE_TTL)
+    return value
+
+
+def get_home_section(name):
+    """
+    Раздел главной страницы из кэша.
+    Пересчитывает только процесс, получивший блокировку; остальные отдают устаревшее
+    значение или ждут результат, поэтому промах кэша под нагрузкой дает один запрос к базе.
+    """
+    data_key, version_key = _data_key(name), _version_key(name)
+    cached = cache.get_many([data_key, version_key])
+    entry = cached.get(data_key)
+    version = cached.get(version_key, 0)
+
+    if entry and entry['version'] == version and entry['fresh_until'] > time.time():
+        return entry['value']
+
+    lock_key = _lock_key(name)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _rebuild(name, version)
+        finally:
+            cache.delete(lock_key)
+
+    if entry:
+        return entry['value']
+
+    # Холодный кэш: ждем, пока пересчет завершит процесс с блокировкой
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(data_key)
+        if entry:
+            return entry['value']
+    return list(HOME_SECTION_BUILDERS[name]())
+
+
+def get_home_sections():
+    return {name: get_home_section(name) for name in HOME_SECTION_BUILDERS}
+
+
+def invalidate_home_sections(*names):
+    """Пометка разделов устаревшими: значение остается доступным до завершения пересчета"""
+    version = time.time_ns()
+    cache.set_many({_version_key(name): version for name in names or HOME_SECTION_BUILDERS}, None)
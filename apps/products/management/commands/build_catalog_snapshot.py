@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.snapshot import build_catalog_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Построение колоночного снимка каталога'
+
+    def handle(self, *args, **options):
+        count = build_catalog_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Снимок каталога построен, товаров: {count}'))
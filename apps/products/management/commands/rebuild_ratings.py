@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Пересчет рейтингов и количества отзывов товаров'
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
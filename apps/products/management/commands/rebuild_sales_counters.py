@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.sales import rebuild_sales_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков продаж товаров по истории заказов'
+
+    def handle(self, *args, **options):
+        updated = rebuild_sales_counters()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.rollup import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет дневной сводки продаж продавцов и товаров по истории заказов; '
+        'запускать, когда оформление заказов остановлено или минимально'
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Строк сводки продавцов: {rows}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import Product
+from apps.products.search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Пересчет поисковых векторов товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+
+        updated = 0
+        for start in range(0, len(product_ids), batch_size):
+            updated += update_search_vector(product_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f'Обновлено поисковых векторов: {updated}'))
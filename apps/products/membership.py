@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import CartItem, Wishlist
+
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(kind, user_id):
+    return f'product_membership:{kind}:{user_id}'
+
+
+def _load_wishlist_ids(user_id):
+    return Wishlist.products.through.objects.filter(
+        wishlist__user_id=user_id
+    ).values_list('product_id', flat=True)
+
+
+def _load_cart_ids(user_id):
+    return CartItem.objects.filter(cart__user_id=user_id).values_list('product_id', flat=True)
+
+
+_LOADERS = {
+    'wishlist': _load_wishlist_ids,
+    'cart': _load_cart_ids,
+}
+
+
+def get_product_ids(kind, user_id):
+    """Множество id товаров в списке желаний или корзине пользователя (из кэша)"""
+    key = _cache_key(kind, user_id)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = frozenset(_LOADERS[kind](user_id))
+        cache.set(key, product_ids, MEMBERSHIP_CACHE_TIMEOUT)
+    return product_ids
+
+
+def invalidate_product_ids(kind, user_id):
+    cache.delete(_cache_key(kind, user_id))
+
+
+def get_membership(request):
+    """
+    Ленивые множества id товаров в списке желаний и корзине, общие для всего запроса.
+    Запрос к кэшу/базе выполняется только при первом обращении из шаблона или представления.
+    """
+    membership = getattr(request, '_product_membership', None)
+    if membership is None:
+        user = request.user
+        if user.is_authenticated:
+            membership = {
+                kind: SimpleLazyObject(lambda kind=kind: get_product_ids(kind, user.pk))
+                for kind in _LOADERS
+            }
+        else:
+            membership = {kind: frozenset() for kind in _LOADERS}
+        request._product_membership = membership
+    return membership
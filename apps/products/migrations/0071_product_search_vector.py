@@ -0,0 +1,35 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0070_initial_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE products_product p SET search_vector =
+                    setweight(to_tsvector('russian', COALESCE(p.name, '')), 'A') ||
+                    setweight(to_tsvector('russian', COALESCE(p.description, '')), 'B') ||
+                    setweight(to_tsvector('russian', COALESCE((
+                        SELECT string_agg(a.value, ' ')
+                        FROM products_productattribute a
+                        WHERE a.product_id = p.id
+                    ), '')), 'C');
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
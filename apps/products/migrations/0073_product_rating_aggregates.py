@@ -0,0 +1,77 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0072_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False, verbose_name='Средний рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 1'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 2'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 3'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 4'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 5'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', '-id'], name='product_rating_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE products_product p SET
+                    review_count = r.review_count,
+                    rating_avg = r.rating_avg,
+                    rating_1_count = r.rating_1_count,
+                    rating_2_count = r.rating_2_count,
+                    rating_3_count = r.rating_3_count,
+                    rating_4_count = r.rating_4_count,
+                    rating_5_count = r.rating_5_count
+                FROM (
+                    SELECT
+                        product_id,
+                        COUNT(*) AS review_count,
+                        AVG(rating)::float AS rating_avg,
+                        COUNT(*) FILTER (WHERE rating = 1) AS rating_1_count,
+                        COUNT(*) FILTER (WHERE rating = 2) AS rating_2_count,
+                        COUNT(*) FILTER (WHERE rating = 3) AS rating_3_count,
+                        COUNT(*) FILTER (WHERE rating = 4) AS rating_4_count,
+                        COUNT(*) FILTER (WHERE rating = 5) AS rating_5_count
+                    FROM products_review
+                    GROUP BY product_id
+                ) r
+                WHERE r.product_id = p.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0073_product_rating_aggregates'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sold_units',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Продано единиц'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество заказов'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sold_units_7d',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Продано за 7 дней'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sold_units_30d',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Продано за 30 дней'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-sold_units', '-id'], name='product_sold_units_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE products_product p SET
+                    sold_units = s.sold_units,
+                    order_count = s.order_count,
+                    sold_units_7d = s.sold_units_7d,
+                    sold_units_30d = s.sold_units_30d
+                FROM (
+                    SELECT
+                        i.product_id,
+                        SUM(i.quantity) AS sold_units,
+                        COUNT(DISTINCT i.order_id) AS order_count,
+                        COALESCE(SUM(i.quantity) FILTER (WHERE o.created_at >= NOW() - INTERVAL '7 days'), 0) AS sold_units_7d,
+                        COALESCE(SUM(i.quantity) FILTER (WHERE o.created_at >= NOW() - INTERVAL '30 days'), 0) AS sold_units_30d
+                    FROM orders_orderitem i
+                    JOIN orders_order o ON o.id = i.order_id
+                    WHERE o.status <> 'cancelled'
+                    GROUP BY i.product_id
+                ) s
+                WHERE s.product_id = p.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils.functional import cached_property
 
 class Category(models.Model):
     name = models.CharField(_('Название'), max_length=100)
@@ -14,6 +17,9 @@ class Category(models.Model):
     class Meta:
         verbose_name = _('Категория')
         verbose_name_plural = _('Категории')
+        indexes = [
+            GinIndex(fields=['name'], name='category_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     
     def __str__(self):
         return self.name
@@ -23,6 +29,22 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+class ProductQuerySet(models.QuerySet):
+    def for_cards(self):
+        """
+        Проекция для карточек товаров в списках: путь основного изображения подзапросом,
+        категория и продавец через JOIN, без тяжелых колонок. Рейтинг, число отзывов
+        и продажи хранятся в самой таблице товаров.
+        """
+        main_image = ProductImage.objects.filter(
+            product=models.OuterRef('pk')
+        ).order_by('-is_main', 'id').values('image')[:1]
+
+        return self.select_related('category', 'seller').defer(
+            'description', 'search_vector'
+        ).annotate(main_image_path=models.Subquery(main_image))
+
+
 class Product(models.Model):
     STATUS_CHOICES = (
         ('active', _('Активен')),
@@ -43,17 +65,58 @@ class Product(models.Model):
     status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Дата обновления'), auto_now=True)
+    search_vector = SearchVectorField(_('Поисковый вектор'), null=True, editable=False)
+    
+    # Денормализованные агрегаты отзывов (обновляются при создании/удалении отзыва)
+    rating_avg = models.FloatField(_('Средний рейтинг'), default=0, editable=False)
+    review_count = models.PositiveIntegerField(_('Количество отзывов'), default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(_('Оценок 1'), default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(_('Оценок 2'), default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(_('Оценок 3'), default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(_('Оценок 4'), default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(_('Оценок 5'), default=0, editable=False)
+    
+    # Счетчики продаж (обновляются при оформлении и отмене заказов)
+    sold_units = models.PositiveIntegerField(_('Продано единиц'), default=0, editable=False)
+    order_count = models.PositiveIntegerField(_('Количество заказов'), default=0, editable=False)
+    sold_units_7d = models.PositiveIntegerField(_('Продано за 7 дней'), default=0, editable=False)
+    sold_units_30d = models.PositiveIntegerField(_('Продано за 30 дней'), default=0, editable=False)
+    
+    # Сумма активных резервов покупателей (apps.orders.reservations)
+    reserved_stock = models.PositiveIntegerField(_('Зарезервировано'), default=0, editable=False)
+    # Режим распродажи: остаток списывается в быстром хранилище, заказы сохраняются в фоне (apps.orders.flash_sale)
+    flash_sale = models.BooleanField(_('Флеш-распродажа'), default=False)
+    
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         verbose_name = _('Товар')
         verbose_name_plural = _('Товары')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['-rating_avg', '-id'], name='product_rating_idx'),
+            models.Index(fields=['-sold_units', '-id'], name='product_sold_units_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    # Счетчики меняются только атомарными UPDATE с F(); обычное сохранение их не перезаписывает
+    COUNTER_FIELDS = (
+        'rating_avg', 'review_count', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+        'rating_4_count', 'rating_5_count', 'sold_units', 'order_count', 'sold_units_7d', 'sold_units_30d',
+        'reserved_stock',
+    )
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -61,10 +124,25 @@ class Product(models.Model):
     
     @property
     def rating(self):
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+        return self.rating_avg
+    
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in range(5, 0, -1)}
+    
+    @property
+    def available_stock(self):
+        """Остаток без учета резервов других покупателей"""
+        return max(self.stock - self.reserved_stock, 0)
+    
+    @cached_property
+    def main_image_url(self):
+        """URL основного изображения (из аннотации for_cards() или отдельным запросом)"""
+        if hasattr(self, 'main_image_path'):
+            path = self.main_image_path
+        else:
+            path = self.images.order_by('-is_main', 'id').values_list('image', flat=True).first()
+        return ProductImage._meta.get_field('image').storage.url(path) if path else None
     
     @property
     def discount_percentage(self):
@@ -148,7 +226,10 @@ class Cart(models.Model):
     
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        total = self.items.aggregate(
+            total=models.Sum(models.F('quantity') * models.F('product__price'), output_field=models.DecimalField())
+        )['total']
+        return total or 0
     
     @property
     def item_count(self):
@@ -197,4 +278,18 @@ class ProductTracking(models.Model):
         unique_together = ('user', 'product')
     
     def __str__(self):
-        return f"{self.user.username} отслеживает {self.product.name}"
\ No newline at end of file
+        return f"{self.user.username} отслеживает {self.product.name}"
+
+class SearchTerm(models.Model):
+    term = models.CharField(_('Слово'), max_length=100, unique=True)
+    frequency = models.PositiveIntegerField(_('Частота'), default=0)
+    
+    class Meta:
+        verbose_name = _('Поисковый термин')
+        verbose_name_plural = _('Поисковые термины')
+        indexes = [
+            GinIndex(fields=['term'], name='search_term_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+    
+    def __str__(self):
+        return self.term
@@ -0,0 +1,175 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _json_default(value):
+    # Полная точность даты (DjangoJSONEncoder обрезает микросекунды)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Тип {type(value).__name__} не поддерживается в курсоре')
+
+
+def encode_cursor(data):
+    payload = json.dumps(data, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class CursorPage:
+    """Страница курсорной пагинации (без подсчета общего количества)"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_url = None
+        self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def build_urls(self, request, param='cursor'):
+        """Ссылки на соседние страницы с сохранением остальных GET-параметров"""
+        params = request.GET.copy()
+        params.pop('page', None)
+        for attr, cursor in (('next_url', self.next_cursor), ('previous_url', self.previous_cursor)):
+            if cursor is None:
+                continue
+            params[param] = cursor
+            setattr(self, attr, f'?{params.urlencode()}')
+        return self
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация: страница выбирается условием по (колонка сортировки, id)
+    относительно последней записи, без OFFSET и COUNT.
+    ordering - последовательность полей, последним должно идти уникальное поле (id).
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.per_page = per_page
+
+    def _order_by(self, backwards):
+        return [('-' if descending != backwards else '') + field for field, descending in self.ordering]
+
+    def _keyset_filter(self, values, backwards):
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field, _ in self.ordering]
+
+    def _output_field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _clean_values(self, values):
+        """Значения курсора в типах полей сортировки; None, если курсор подделан или устарел"""
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        try:
+            cleaned = [
+                self._output_field(field).to_python(value)
+                for (field, _), value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        return None if None in cleaned else cleaned
+
+    def get_page(self, cursor):
+        data = decode_cursor(cursor) or {}
+        values = self._clean_values(data.get('k'))
+        backwards = bool(values and data.get('b'))
+
+        queryset = self.queryset.order_by(*self._order_by(backwards))
+        if values:
+            queryset = queryset.filter(self._keyset_filter(values, backwards))
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+
+        has_next = True if backwards else has_more
+        has_previous = has_more if backwards else values is not None
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = encode_cursor({'k': self._key(items[-1])})
+        if items and has_previous:
+            previous_cursor = encode_cursor({'k': self._key(items[0]), 'b': 1})
+        return CursorPage(items, next_cursor, previous_cursor)
+
+
+def cursor_paginate(request, queryset, ordering, per_page, param='cursor'):
+    """Курсорная страница для запроса с готовыми ссылками next_url/previous_url"""
+    page = CursorPaginator(queryset, ordering, per_page).get_page(request.GET.get(param))
+    return page.build_urls(request, param)
+
+
+def offset_cursor_paginate(request, sequence, per_page, param='cursor'):
+    """Курсорная страница по последовательности в памяти (например, id из снимка каталога)"""
+    data = decode_cursor(request.GET.get(param)) or {}
+    offset = data.get('o')
+    if not isinstance(offset, int) or offset < 0:
+        offset = 0
+
+    items = sequence[offset:offset + per_page]
+    next_cursor = encode_cursor({'o': offset + per_page}) if offset + per_page < len(sequence) else None
+    previous_cursor = encode_cursor({'o': max(offset - per_page, 0)}) if offset > 0 else None
+    return CursorPage(items, next_cursor, previous_cursor).build_urls(request, param)
+
+
+class CursorPaginationMixin:
+    """Курсорная пагинация для ListView вместо OFFSET-пагинации с COUNT"""
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        page = cursor_paginate(self.request, queryset, self.get_cursor_ordering(), page_size)
+        return None, page, page, page.has_other_pages()
@@ -0,0 +1,57 @@
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Product, Review
+
+STARS = range(1, 6)
+
+
+def apply_review_change(product_id, added_rating=None, removed_rating=None):
+    """
+    Инкрементальное обновление агрегатов отзывов товара одним атомарным UPDATE.
+    Значения считаются от текущих значений строки, поэтому параллельные отзывы не теряются.
+    """
+    deltas = {star: 0 for star in STARS}
+    if added_rating:
+        deltas[added_rating] += 1
+    if removed_rating:
+        deltas[removed_rating] -= 1
+    count_delta = sum(deltas.values())
+
+    if not any(deltas.values()):
+        return 0
+
+    new_count = F('review_count') + count_delta
+    star_sum = sum(star * (F(f'rating_{star}_count') + deltas[star]) for star in STARS)
+
+    updates = {
+        f'rating_{star}_count': F(f'rating_{star}_count') + delta
+        for star, delta in deltas.items() if delta
+    }
+    updates['review_count'] = new_count
+    updates['rating_avg'] = Coalesce(
+        Cast(star_sum, FloatField()) / Cast(NullIf(new_count, Value(0)), FloatField()),
+        Value(0.0)
+    )
+
+    return Product.objects.filter(pk=product_id).update(**updates)
+
+
+def rebuild_rating_aggregates(product_ids=None):
+    """Полный пересчет агрегатов отзывов из таблицы отзывов"""
+    reviews = Review.objects.filter(product=OuterRef('pk')).values('product')
+
+    def aggregate(expression):
+        return Subquery(reviews.annotate(value=expression).values('value'))
+
+    updates = {
+        'rating_avg': Coalesce(aggregate(Avg('rating', output_field=FloatField())), Value(0.0)),
+        'review_count': Coalesce(aggregate(Count('id')), Value(0)),
+    }
+    for star in STARS:
+        updates[f'rating_{star}_count'] = Coalesce(aggregate(Count('id', filter=Q(rating=star))), Value(0))
+
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products.update(**updates)
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Product
+from apps.orders.models import OrderItem
+from apps.orders.rollup import record_status_change
+
+SALES_WINDOWS = {'sold_units_7d': 7, 'sold_units_30d': 30}
+
+
+def record_sales(items, sign=1):
+    """
+    Обновление счетчиков продаж одним UPDATE.
+    items - пары (product_id, quantity); sign=1 при оформлении заказа, -1 при отмене.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    if not quantities:
+        return 0
+
+    units = Case(
+        *[When(pk=product_id, then=Value(sign * quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    # Greatest защищает от ухода в минус, если окно уже пересчитано без отмененного заказа
+    updates = {
+        field: Greatest(F(field) + units, Value(0))
+        for field in ('sold_units', *SALES_WINDOWS)
+    }
+    updates['order_count'] = Greatest(F('order_count') + sign, Value(0))
+
+    return Product.objects.filter(pk__in=quantities).update(**updates)
+
+
+def record_order_status_change(order, old_status, new_status):
+    """
+    Перенос заказа между статусами в дневной сводке; счетчики товаров корректируются
+    только при отмене заказа или его восстановлении из отмены.
+    """
+    if old_status == new_status:
+        return 0
+    record_status_change(order, old_status, new_status)
+    if 'cancelled' not in (old_status, new_status):
+        return 0
+    sign = -1 if new_status == 'cancelled' else 1
+    return record_sales(order.items.values_list('product_id', 'quantity'), sign)
+
+
+def _sold_units_subquery(since=None):
+    items = OrderItem.objects.filter(product=OuterRef('pk')).exclude(order__status='cancelled')
+    if since is not None:
+        items = items.filter(order__created_at__gte=since)
+    return Coalesce(
+        Subquery(items.values('product').annotate(total=Sum('quantity')).values('total')),
+        Value(0)
+    )
+
+
+def refresh_sales_windows():
+    """Пересчет скользящих окон продаж (7 и 30 дней) для товаров с продажами за период"""
+    now = timezone.now()
+    since = now - timedelta(days=max(SALES_WINDOWS.values()))
+
+    recent_product_ids = OrderItem.objects.filter(order__created_at__gte=since).values('product_id')
+    products = Product.objects.filter(
+        Q(pk__in=recent_product_ids) | Q(sold_units_7d__gt=0) | Q(sold_units_30d__gt=0)
+    )
+    return products.update(**{
+        field: _sold_units_subquery(now - timedelta(days=days))
+        for field, days in SALES_WINDOWS.items()
+    })
+
+
+def rebuild_sales_counters():
+    """Полный пересчет счетчиков продаж по истории заказов"""
+    order_count = OrderItem.objects.filter(product=OuterRef('pk')).exclude(
+        order__status='cancelled'
+    ).values('product').annotate(total=Count('order', distinct=True)).values('total')
+
+    updated = Product.objects.update(
+        sold_units=_sold_units_subquery(),
+        order_count=Coalesce(Subquery(order_count), Value(0)),
+    )
+    refresh_sales_windows()
+    return updated
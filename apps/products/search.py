@@ -0,0 +1,122 @@
+from collections import Counter
+from functools import reduce
+import operator
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity, TrigramWordSimilarity
+)
+from django.db import transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .models import Product, ProductAttribute, Category, SearchTerm
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = 'russian'
+
+# Слова короче трех символов не дают осмысленных триграмм
+TERM_PATTERN = re.compile(r'\w{3,}')
+TERM_MAX_LENGTH = 100
+
+
+def product_search_vector():
+    """Выражение для поискового вектора товара: название > описание > значения атрибутов"""
+    attribute_values = ProductAttribute.objects.filter(
+        product=OuterRef('pk')
+    ).values('product').annotate(
+        text=StringAgg('value', delimiter=' ')
+    ).values('text')
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='B', config=SEARCH_CONFIG) +
+        SearchVector(Coalesce(Subquery(attribute_values), Value('')), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(product_ids):
+    """Пересчет поискового вектора для указанных товаров одним UPDATE"""
+    return Product.objects.filter(pk__in=product_ids).update(search_vector=product_search_vector())
+
+
+def build_search_query(terms):
+    """Создание поискового запроса из строки или списка ключевых слов"""
+    if isinstance(terms, str):
+        terms = [terms]
+
+    queries = [
+        SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+        for term in terms if term and str(term).strip()
+    ]
+    if not queries:
+        return None
+    return reduce(operator.or_, queries)
+
+
+def search_products(queryset, terms):
+    """Фильтрация товаров по поисковому вектору с аннотацией релевантности (rank)"""
+    query = build_search_query(terms)
+    if query is None:
+        return queryset
+
+    # real -> double precision: значение rank из курсора пагинации должно точно совпадать с колонкой
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+
+
+def tokenize(text):
+    """Разбиение текста на слова для словаря поиска"""
+    return [word.lower() for word in TERM_PATTERN.findall(text or '')]
+
+
+def fuzzy_search_products(queryset, query):
+    """Нечеткий поиск по триграммам в названиях товаров и категорий (устойчив к опечаткам)"""
+    return queryset.filter(
+        Q(name__trigram_word_similar=query) |
+        Q(category__name__trigram_word_similar=query)
+    ).annotate(
+        rank=Cast(Greatest(
+            TrigramWordSimilarity(query, 'name'),
+            TrigramWordSimilarity(query, 'category__name'),
+        ), FloatField())
+    )
+
+
+def suggest_query(query):
+    """Подбор исправленного запроса по словарю каталога ("Возможно, вы имели в виду")"""
+    words = tokenize(query)
+    corrected = []
+
+    for word in words:
+        match = SearchTerm.objects.filter(
+            term__trigram_similar=word
+        ).annotate(
+            similarity=TrigramSimilarity('term', word)
+        ).order_by('-similarity', '-frequency').values_list('term', flat=True).first()
+        corrected.append(match or word)
+
+    if not words or corrected == words:
+        return None
+    return ' '.join(corrected)
+
+
+def rebuild_search_terms():
+    """Пересборка словаря поиска из названий активных товаров и категорий"""
+    counter = Counter()
+    names = Product.objects.filter(status='active').values_list('name', flat=True)
+    for name in names.iterator(chunk_size=2000):
+        counter.update(tokenize(name))
+    for name in Category.objects.values_list('name', flat=True):
+        counter.update(tokenize(name))
+
+    terms = [
+        SearchTerm(term=term, frequency=frequency)
+        for term, frequency in counter.items() if len(term) <= TERM_MAX_LENGTH
+    ]
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        SearchTerm.objects.bulk_create(terms, batch_size=1000)
+    return len(terms)
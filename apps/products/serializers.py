@@ -35,7 +35,8 @@ class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     attributes = ProductAttributeSerializer(many=True, read_only=True)
     reviews = ReviewSerializer(many=True, read_only=True)
-    rating = serializers.FloatField(read_only=True)
+    rating = serializers.FloatField(source='rating_avg', read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     
     class Meta:
         model = Product
@@ -43,21 +44,21 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'description', 'price', 'old_price',
             'stock', 'status', 'category', 'category_name', 'seller',
             'seller_username', 'images', 'attributes', 'reviews',
-            'rating', 'created_at', 'updated_at'
+            'rating', 'review_count', 'rating_histogram', 'created_at', 'updated_at'
         ]
 
 class ProductListSerializer(serializers.ModelSerializer):
     category_name = serializers.ReadOnlyField(source='category.name')
     seller_username = serializers.ReadOnlyField(source='seller.username')
     main_image = serializers.SerializerMethodField()
-    rating = serializers.FloatField(read_only=True)
+    rating = serializers.FloatField(source='rating_avg', read_only=True)
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'price', 'old_price', 'stock',
             'status', 'category_name', 'seller_username', 'main_image',
-            'rating'
+            'rating', 'review_count'
         ]
     
     def get_main_image(self, obj):
@@ -1,8 +1,17 @@
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils.text import slugify
-from .models import Product, ProductTracking
-from apps.notifications.models import Notification
+from .models import Product, ProductTracking, ProductAttribute, Review, Cart, CartItem, Wishlist, Category
+from .search import update_search_vector
+from .ratings import apply_review_change
+from .membership import invalidate_product_ids
+from .cart import anonymous_carts_enabled, merge_anonymous_cart
+from .categories import invalidate_category_tree
+from .homepage import invalidate_home_sections
+from .bulk import product_change_payload
+from apps.notifications.outbox import outbox_handler, publish
 import random
 import string
 
@@ -21,76 +30,154 @@ def create_product_slug(sender, instance, **kwargs):
             random_string = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
             instance.slug = f"{base_slug}-{random_string}"
 
-@receiver(post_save, sender=Product)
-def product_update_notification(sender, instance, created, **kwargs):
-    """Отправка уведомлений при обновлении товара"""
-    if not created:
-        # Получаем все отслеживания для данного товара
-        trackings = ProductTracking.objects.filter(product=instance)
-        
-        # Проверяем изменения в товаре и отправляем уведомления
-        for tracking in trackings:
-            # Проверяем изменение цены
-            if tracking.track_price and hasattr(instance, '_price_changed') and instance._price_changed:
-                if instance.old_price and instance.price < instance.old_price:
-                    # Снижение цены
-                    Notification.objects.create(
-                        user=tracking.user,
-                        notification_type='product_change',
-                        title=f'Снижение цены на {instance.name}',
-                        message=f'Цена снизилась с {instance.old_price} ₸ до {instance.price} ₸',
-                        link=instance.get_absolute_url()
-                    )
-                else:
-                    # Обычное изменение цены
-                    Notification.objects.create(
-                        user=tracking.user,
-                        notification_type='product_change',
-                        title=f'Изменение цены на {instance.name}',
-                        message=f'Новая цена: {instance.price} ₸',
-                        link=instance.get_absolute_url()
-                    )
-            
-            # Проверяем изменение наличия
-            if tracking.track_stock and hasattr(instance, '_stock_changed') and instance._stock_changed:
-                if instance.stock > 0 and hasattr(instance, '_was_out_of_stock') and instance._was_out_of_stock:
-                    # Товар снова в наличии
-                    Notification.objects.create(
-                        user=tracking.user,
-                        notification_type='product_change',
-                        title=f'{instance.name} снова в наличии',
-                        message=f'Товар появился в наличии. Количество: {instance.stock} шт.',
-                        link=instance.get_absolute_url()
-                    )
-            
-            # Проверяем появление скидки
-            if tracking.track_discount and instance.old_price and hasattr(instance, '_discount_added') and instance._discount_added:
-                discount_percentage = instance.discount_percentage
-                Notification.objects.create(
-                    user=tracking.user,
-                    notification_type='product_change',
-                    title=f'Скидка на {instance.name}',
-                    message=f'Появилась скидка {discount_percentage}%. Новая цена: {instance.price} ₸',
-                    link=instance.get_absolute_url()
-                )
-
 @receiver(pre_save, sender=Product)
 def product_change_detection(sender, instance, **kwargs):
-    """Обнаружение изменений в товаре для отправки уведомлений"""
+    """Запоминаем прежние цену и наличие для уведомлений отслеживающим"""
+    instance._old_values = None
     if instance.pk:
-        # Получаем предыдущее состояние товара
-        old_instance = Product.objects.get(pk=instance.pk)
-        
-        # Проверяем изменение цены
-        if old_instance.price != instance.price:
-            instance._price_changed = True
+        instance._old_values = Product.objects.filter(pk=instance.pk).values('price', 'old_price', 'stock').first()
+
+@receiver(post_save, sender=Product)
+def publish_product_changed(sender, instance, created, **kwargs):
+    """Событие об изменении цены, наличия или скидки; уведомления отслеживающим - из outbox"""
+    if created or not getattr(instance, '_old_values', None):
+        return
+    payload = product_change_payload(instance.pk, instance._old_values, {
+        'price': instance.price,
+        'old_price': instance.old_price,
+        'stock': instance.stock,
+    })
+    if payload is not None:
+        publish('product.changed', **payload)
+
+@outbox_handler('product.changed')
+def product_change_notifications(payload):
+    """Уведомления пользователям, отслеживающим товар"""
+    product = Product.objects.filter(pk=payload['product_id']).only('name', 'slug').first()
+    if product is None:
+        return []
+    link = product.get_absolute_url()
+    
+    notifications = []
+    for tracking in ProductTracking.objects.filter(product_id=product.pk):
+        # Изменение цены
+        if tracking.track_price and payload['price_changed']:
+            if payload['price_dropped']:
+                title = f'Снижение цены на {product.name}'
+                message = f'Цена снизилась с {payload["old_price"]} ₸ до {payload["price"]} ₸'
+            else:
+                title = f'Изменение цены на {product.name}'
+                message = f'Новая цена: {payload["price"]} ₸'
+            notifications.append((tracking.user_id, title, message))
         
-        # Проверяем изменение наличия
-        if old_instance.stock != instance.stock:
-            instance._stock_changed = True
-            if old_instance.stock <= 0 and instance.stock > 0:
-                instance._was_out_of_stock = True
+        # Товар снова в наличии
+        if tracking.track_stock and payload['back_in_stock']:
+            notifications.append((
+                tracking.user_id,
+                f'{product.name} снова в наличии',
+                f'Товар появился в наличии. Количество: {payload["stock"]} шт.',
+            ))
         
-        # Проверяем появление скидки
-        if (not old_instance.old_price or old_instance.price == old_instance.old_price) and instance.old_price and instance.price < instance.old_price:
-            instance._discount_added = True
+        # Появление скидки
+        if tracking.track_discount and payload['discount_added']:
+            notifications.append((
+                tracking.user_id,
+                f'Скидка на {product.name}',
+                f'Появилась скидка {payload["discount_percentage"]}%. Новая цена: {payload["price"]} ₸',
+            ))
+    
+    return [
+        {'user_id': user_id, 'notification_type': 'product_change', 'title': title, 'message': message, 'link': link}
+        for user_id, title, message in notifications
+    ]
+
+@receiver(post_save, sender=Product)
+def product_search_vector_update(sender, instance, created, update_fields=None, **kwargs):
+    """Обновление поискового вектора при изменении названия или описания"""
+    if update_fields is not None and not {'name', 'description'} & set(update_fields):
+        return
+    update_search_vector([instance.pk])
+
+@receiver([post_save, post_delete], sender=ProductAttribute)
+def attribute_search_vector_update(sender, instance, **kwargs):
+    """Обновление поискового вектора при изменении атрибутов товара"""
+    update_search_vector([instance.product_id])
+
+@receiver(pre_save, sender=Review)
+def review_rating_change_detection(sender, instance, **kwargs):
+    """Запоминаем прежнюю оценку при редактировании отзыва"""
+    if instance.pk:
+        instance._old_rating = Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+@receiver(post_save, sender=Review)
+def review_rating_aggregates_update(sender, instance, created, **kwargs):
+    """Обновление рейтинга товара при добавлении или изменении отзыва"""
+    if created:
+        apply_review_change(instance.product_id, added_rating=instance.rating)
+    elif getattr(instance, '_old_rating', None) and instance._old_rating != instance.rating:
+        apply_review_change(instance.product_id, added_rating=instance.rating, removed_rating=instance._old_rating)
+
+@receiver(post_delete, sender=Review)
+def review_rating_aggregates_delete(sender, instance, **kwargs):
+    """Обновление рейтинга товара при удалении отзыва"""
+    apply_review_change(instance.product_id, removed_rating=instance.rating)
+
+@receiver(m2m_changed, sender=Wishlist.products.through)
+def wishlist_membership_invalidate(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сброс кэша id товаров в списке желаний при его изменении"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.user_id]
+    else:
+        # Изменение со стороны товара (product.wishlists) - затронутые списки в pk_set
+        wishlists = Wishlist.objects.filter(pk__in=pk_set) if pk_set else Wishlist.objects.all()
+        user_ids = list(wishlists.values_list('user_id', flat=True))
+
+    def invalidate():
+        for user_id in user_ids:
+            invalidate_product_ids('wishlist', user_id)
+    # После фиксации: иначе параллельный запрос закэширует прежний состав
+    transaction.on_commit(invalidate)
+
+@receiver([post_save, post_delete], sender=CartItem)
+def cart_membership_invalidate(sender, instance, **kwargs):
+    """Сброс кэша id товаров в корзине при изменении ее состава"""
+    user_id = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate_product_ids('cart', user_id))
+
+@receiver([post_save, post_delete], sender=Category)
+def category_tree_invalidate(sender, instance, **kwargs):
+    """Новая версия дерева категорий после изменения любой категории"""
+    transaction.on_commit(invalidate_category_tree)
+
+@receiver(post_save, sender=Product)
+def home_sections_product_update(sender, instance, created, **kwargs):
+    """Изменение товара влияет на витрины главной; количество по категориям - только новый товар"""
+    sections = ['featured_products', 'best_selling', 'top_rated']
+    if created:
+        sections.append('top_categories')
+    transaction.on_commit(lambda: invalidate_home_sections(*sections))
+
+@receiver(post_delete, sender=Product)
+def home_sections_product_delete(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_home_sections)
+
+@receiver([post_save, post_delete], sender=Review)
+def home_sections_review_update(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_home_sections('top_rated'))
+
+@receiver([post_save, post_delete], sender=Category)
+def home_sections_category_update(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_home_sections('top_categories'))
+
+@receiver(user_logged_in)
+def anonymous_cart_merge(sender, request, user, **kwargs):
+    """Перенос анонимной корзины в корзину пользователя после входа"""
+    if request is None or not anonymous_carts_enabled():
+        return
+    merge_anonymous_cart(request, user, lambda product_ids: {
+        product.id: product.available_stock
+        for product in Product.objects.filter(pk__in=product_ids, status='active').only('stock', 'reserved_stock')
+    })
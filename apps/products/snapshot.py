@@ -0,0 +1,147 @@
+import os
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import Product
+
+# Колонки снимка каталога и их типы
+COLUMNS = {
+    'id': np.int64,
+    'price': np.float64,
+    'category': np.int64,
+    'rating': np.float32,
+    'sales': np.int64,
+    'created_at': np.int64,
+}
+
+POINTER_FILE = 'CURRENT'
+KEEP_VERSIONS = 2
+
+
+def _snapshot_root():
+    return settings.CATALOG_SNAPSHOT_DIR
+
+
+def build_catalog_snapshot():
+    """Построение нового снимка активных товаров и атомарная публикация"""
+    rows = Product.objects.filter(status='active').values_list(
+        'id', 'price', 'category_id', 'rating_avg', 'sold_units', 'created_at'
+    )
+
+    columns = {name: [] for name in COLUMNS}
+    for product_id, price, category_id, rating_value, sales_value, created_at in rows.iterator(chunk_size=5000):
+        columns['id'].append(product_id)
+        columns['price'].append(float(price))
+        columns['category'].append(category_id)
+        columns['rating'].append(rating_value)
+        columns['sales'].append(sales_value)
+        columns['created_at'].append(int(created_at.timestamp() * 1_000_000))
+
+    root = _snapshot_root()
+    version = f'v{time.time_ns()}'
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir)
+    for name, dtype in COLUMNS.items():
+        np.save(os.path.join(version_dir, f'{name}.npy'), np.asarray(columns[name], dtype=dtype))
+
+    # Атомарно переключаем указатель на новую версию
+    pointer_tmp = os.path.join(root, f'{POINTER_FILE}.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, POINTER_FILE))
+
+    # Удаляем старые версии (уже открытые mmap остаются валидными до закрытия)
+    versions = sorted(d for d in os.listdir(root) if d.startswith('v'))
+    for old_version in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, old_version), ignore_errors=True)
+
+    return len(columns['id'])
+
+
+class CatalogSnapshot:
+    """Колоночный снимок каталога, отображенный в память (общий для всех воркеров)"""
+
+    def __init__(self, path):
+        self.columns = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def _category_mask(self, category_ids):
+        if category_ids is None:
+            return np.ones(len(self), dtype=bool)
+        return np.isin(self.columns['category'], list(category_ids))
+
+    def _price_mask(self, min_price, max_price):
+        price = self.columns['price']
+        mask = np.ones(len(self), dtype=bool)
+        if min_price is not None:
+            mask &= price >= min_price
+        if max_price is not None:
+            mask &= price <= max_price
+        return mask
+
+    def query(self, category_ids=None, min_price=None, max_price=None, sort_by='newest'):
+        """Фильтрация и сортировка векторными операциями, возвращает упорядоченные id товаров"""
+        ids = self.columns['id']
+        price = self.columns['price']
+
+        mask = self._category_mask(category_ids) & self._price_mask(min_price, max_price)
+        rows = np.flatnonzero(mask)
+        # np.lexsort сортирует по последнему ключу, id - дополнительный ключ для стабильности
+        if sort_by == 'price_low':
+            order = np.lexsort((-ids[rows], price[rows]))
+        elif sort_by == 'price_high':
+            order = np.lexsort((-ids[rows], -price[rows]))
+        elif sort_by == 'rating':
+            order = np.lexsort((-ids[rows], -self.columns['rating'][rows]))
+        elif sort_by == 'popularity':
+            order = np.lexsort((-ids[rows], -self.columns['sales'][rows]))
+        else:
+            order = np.lexsort((-ids[rows], -self.columns['created_at'][rows]))
+
+        return ids[rows[order]]
+
+    def facet_counts(self, price_bounds, category_ids=None, min_price=None, max_price=None):
+        """Количество товаров по категориям (с фильтром цены) и по ценовым диапазонам (с фильтром категории)"""
+        category_ids_column = self.columns['category'][self._price_mask(min_price, max_price)]
+        categories, counts = np.unique(category_ids_column, return_counts=True)
+
+        # Диапазон [нижняя, верхняя] с включенной верхней границей - как фильтр min_price/max_price
+        prices = np.sort(self.columns['price'][self._category_mask(category_ids)])
+        bounds = np.asarray(price_bounds, dtype=np.float64)
+        starts = np.searchsorted(prices, bounds, side='left')
+        ends = np.append(np.searchsorted(prices, bounds[1:], side='right'), len(prices))
+        bucket_counts = ends - starts
+
+        return dict(zip(categories.tolist(), counts.tolist())), bucket_counts.tolist()
+
+
+_loaded = {'version': None, 'snapshot': None}
+
+
+def get_catalog_snapshot():
+    """Текущий снимок каталога для процесса или None, если снимок еще не построен"""
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+
+    try:
+        with open(os.path.join(_snapshot_root(), POINTER_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+
+    if version != _loaded['version']:
+        try:
+            _loaded['snapshot'] = CatalogSnapshot(os.path.join(_snapshot_root(), version))
+        except FileNotFoundError:
+            return _loaded['snapshot']
+        _loaded['version'] = version
+
+    return _loaded['snapshot']
@@ -90,3 +90,21 @@ def process_product_images(product_id):
     except Exception as e:
         # Обработка ошибок
         print(f"Error processing images for product {product_id}: {e}")
+
+@shared_task
+def rebuild_search_vocabulary():
+    """Пересборка словаря для исправления опечаток в поиске"""
+    from .search import rebuild_search_terms
+    return rebuild_search_terms()
+
+@shared_task
+def rebuild_catalog_snapshot():
+    """Пересборка колоночного снимка каталога для страницы товаров"""
+    from .snapshot import build_catalog_snapshot
+    return build_catalog_snapshot()
+
+@shared_task
+def refresh_sales_windows():
+    """Пересчет продаж за последние 7 и 30 дней"""
+    from .sales import refresh_sales_windows as refresh
+    return refresh()
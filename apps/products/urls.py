@@ -19,10 +19,12 @@ urlpatterns = [
     # Seller dashboard
     path('seller/', views.SellerDashboardView.as_view(), name='seller_dashboard'),
     path('seller/products/', views.SellerProductsView.as_view(), name='seller_products'),
+    path('seller/products/bulk-update/', views.seller_bulk_update_products, name='seller_bulk_update_products'),
     path('seller/product/add/', views.SellerProductCreateView.as_view(), name='seller_product_add'),
     path('seller/product/<int:pk>/edit/', views.SellerProductUpdateView.as_view(), name='seller_product_edit'),
     path('seller/product/<int:pk>/delete/', views.SellerProductDeleteView.as_view(), name='seller_product_delete'),
     path('seller/orders/', views.SellerOrdersView.as_view(), name='seller_orders'),
+    path('seller/orders/export/', views.SellerOrdersExportView.as_view(), name='seller_orders_export'),
     path('seller/order/<int:pk>/', views.SellerOrderDetailView.as_view(), name='seller_order_detail'),
     path('seller/order/<int:pk>/update-status/', views.SellerOrderUpdateStatusView.as_view(), name='seller_order_update_status'),
     path('seller/generate-description/', views.seller_generate_description, name='seller_generate_description'),
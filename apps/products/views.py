@@ -1,103 +1,183 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.db.models import Q, Avg, Count, Sum
-from django.http import HttpResponseRedirect, JsonResponse
-from django.urls import reverse_lazy
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect, JsonResponse, Http404
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, UpdateView, DeleteView, DetailView  # Добавьте эти классы
 from apps.orders.models import Order  # Добавьте импорт Order
 
 from apps.orders.models import OrderStatus
-from .models import Product, Category, Cart, CartItem, ProductImage, ProductVideo, ReviewImage, Wishlist, Review, ProductTracking, ProductAttribute
+from apps.orders.reservations import available_stock, release_reservations
+from apps.orders.flash_sale import flash_available
+from apps.orders.rollup import completed_totals, daily_revenue, top_products
+from apps.orders.export import EXPORT_FORMATS, export_response
+from .models import Product, Cart, CartItem, ProductImage, ProductVideo, ReviewImage, Wishlist, Review, ProductTracking, ProductAttribute
 from .forms import ProductAttributeFormSet, ProductForm, ReviewForm
+from .search import search_products, fuzzy_search_products, suggest_query
+from .snapshot import get_catalog_snapshot
+from .facets import catalog_filters, get_catalog_facets
+from .sales import record_order_status_change
+from .membership import get_membership
+from .bulk import MAX_BULK_ROWS, bulk_update_products
+from .cart import add_anonymous_item, add_item, anonymous_carts_enabled, cart_summary, set_quantity, summary_json
+from .categories import get_category_tree
+from .homepage import get_home_sections
+from .conditional import conditional_json, make_etag, not_modified, set_validators
+from .detail import PRODUCT_DETAIL_QUERY_BUDGET, load_product_detail, product_detail_queryset, query_budget
+from .pagination import CursorPaginationMixin, cursor_paginate, offset_cursor_paginate
 from apps.ai_assistant.utils import generate_ai_product_description
-import time
 import json
 from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from apps.user_activities.models import UserActivity
+from apps.user_activities.tracking import record_product_view, record_view_time
+from apps.accounts.presence import is_online
+from apps.notifications.unread import get_unread_count
 
 def home(request):
-    featured_products = Product.objects.filter(status='active').order_by('-created_at')[:8]
-    top_categories = Category.objects.annotate(product_count=Count('products')).order_by('-product_count')[:6]
-    best_selling = Product.objects.filter(status='active').annotate(order_count=Count('order_items')).order_by('-order_count')[:8]
-    top_rated = Product.objects.filter(status='active', reviews__isnull=False).annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')[:8]
-    
-    context = {
-        'featured_products': featured_products,
-        'top_categories': top_categories,
-        'best_selling': best_selling,
-        'top_rated': top_rated,
-    }
+    # Разделы одинаковы для всех посетителей и берутся из кэша
+    context = get_home_sections()
     return render(request, 'products/home.html', context)
 
+PRODUCTS_PER_PAGE = 12
+
+# Порядок сортировки каталога: колонка сортировки + id для keyset-пагинации
+PRODUCT_SORT_ORDERINGS = {
+    'relevance': ('-rank', '-id'),
+    'newest': ('-created_at', '-id'),
+    'price_low': ('price', '-id'),
+    'price_high': ('-price', '-id'),
+    'rating': ('-rating_avg', '-id'),
+    'popularity': ('-sold_units', '-id'),
+}
+
+def _parse_price(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def _category_menu(nodes, counts):
+    """Пункты меню категорий с количеством товаров (узлы дерева общие, поэтому не изменяются)"""
+    return [
+        {
+            'id': node.id,
+            'name': node.name,
+            'slug': node.slug,
+            'facet_count': counts.get(node.id, 0),
+            'children': _category_menu(node.children, counts),
+        }
+        for node in nodes
+    ]
+
 def product_list(request):
-    categories = Category.objects.all()
-    products = Product.objects.filter(status='active')
+    category_tree = get_category_tree()
+    matched = Product.objects.filter(status='active')
     
-    # Фильтрация по категории
+    # Фильтрация по категории (включая подкатегории)
     category_slug = request.GET.get('category')
+    category = None
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+        category = category_tree.get_by_slug(category_slug)
+        if category is None:
+            raise Http404('Категория не найдена')
     
     # Фильтрация по цене
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    
-    # Поиск по названию или описанию
+    min_price = _parse_price(request.GET.get('min_price'))
+    max_price = _parse_price(request.GET.get('max_price'))
+    
+    category_filter, price_filter = catalog_filters(category, min_price, max_price)
+    
     search_query = request.GET.get('q')
+    search_mode = request.GET.get('mode', 'fulltext')
+    suggested_query = None
+    sort_by = request.GET.get('sort_by', 'relevance' if search_query else 'newest')
+    
+    # Полнотекстовый поиск по названию, описанию и атрибутам,
+    # при отсутствии результатов - нечеткий поиск по триграммам
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
+        if search_mode != 'fuzzy':
+            found = search_products(matched, search_query)
+            if found.filter(category_filter, price_filter).exists():
+                matched = found
+            else:
+                search_mode = 'fuzzy'
+        if search_mode == 'fuzzy':
+            matched = fuzzy_search_products(matched, search_query)
+            suggested_query = suggest_query(search_query)
+    
+    products = matched.filter(category_filter, price_filter).for_cards()
+    
+    # Без поискового запроса фильтры, сортировка и фасеты считаются по снимку каталога,
+    # из базы загружается только текущая страница
+    snapshot = None if search_query else get_catalog_snapshot()
+    facets = get_catalog_facets(matched, category, min_price, max_price, snapshot=snapshot)
+    category_counts = {facet['id']: facet['count'] for facet in facets['categories']}
+    categories = _category_menu(category_tree.roots, category_counts)
+    
+    if request.GET.get('format') == 'json':
+        return conditional_json(request, {'status': 'success', 'facets': facets})
+    
+    if snapshot is not None:
+        product_ids = snapshot.query(
+            category_ids=category.descendant_ids if category else None,
+            min_price=min_price,
+            max_price=max_price,
+            sort_by=sort_by,
         )
-    
-    # Сортировка
-    sort_by = request.GET.get('sort_by', 'newest')
-    if sort_by == 'newest':
-        products = products.order_by('-created_at')
-    elif sort_by == 'price_low':
-        products = products.order_by('price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price')
-    elif sort_by == 'rating':
-        products = products.annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')
-    elif sort_by == 'popularity':
-        products = products.annotate(order_count=Count('order_items')).order_by('-order_count')
+        page = offset_cursor_paginate(request, product_ids, PRODUCTS_PER_PAGE)
+        page_ids = [int(product_id) for product_id in page.object_list]
+        products_by_id = products.in_bulk(page_ids)
+        page.object_list = [products_by_id[product_id] for product_id in page_ids if product_id in products_by_id]
+    else:
+        # Сортировка (при поиске по умолчанию - по релевантности)
+        if sort_by == 'relevance' and not search_query:
+            sort_by = 'newest'
+        if sort_by not in PRODUCT_SORT_ORDERINGS:
+            sort_by = 'newest'
+        
+        page = cursor_paginate(request, products, PRODUCT_SORT_ORDERINGS[sort_by], PRODUCTS_PER_PAGE)
     
     context = {
         'categories': categories,
-        'products': products,
+        'category': category,
+        'category_slug': category_slug,
+        'products': page,
+        'facets': facets,
         'search_query': search_query,
+        'search_mode': search_mode,
+        'suggested_query': suggested_query,
         'sort_by': sort_by,
     }
     return render(request, 'products/product_list.html', context)
 
-def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, status='active')
-    reviews = product.reviews.all().order_by('-created_at')
-    related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
-    
-    # Запись времени активности пользователя
+def _product_detail_validators(request, product, can_review, has_reviewed, seller_online):
+    """ETag и Last-Modified страницы товара: товар, отзывы, похожие товары и состояние пользователя"""
+    last_modified = max(
+        value for value in (product.updated_at, product.last_review_at, product.related_updated_at) if value
+    )
+    parts = [product.pk, product.updated_at, product.last_review_at, product.related_updated_at,
+             product.review_count, product.rating_avg, product.stock, product.reserved_stock, seller_online]
     if request.user.is_authenticated:
-        view_time_start = request.session.get(f'view_time_start_{product.id}')
-        if not view_time_start:
-            request.session[f'view_time_start_{product.id}'] = time.time()
-        
-        # Обновление счетчика просмотров и активности
-        user_activity, created = request.user.activities.get_or_create(product=product)
-        if not created:
-            user_activity.view_count += 1
-            user_activity.save()
-    
-    # Форма отзыва
-    form = ReviewForm()
+        membership = get_membership(request)
+        parts += [
+            request.user.pk, request.user.username, request.user.is_seller(),
+            get_unread_count(request.user.pk),
+            product.pk in membership['wishlist'],
+            len(membership['cart']), len(membership['wishlist']),
+            can_review, has_reviewed,
+        ]
+    return make_etag(*parts), last_modified
+
+def _render_product_detail(request, product):
+    # Просмотр учитывается в быстром хранилище (в том числе при ответе 304)
+    if request.user.is_authenticated:
+        record_product_view(request.user.pk, product.pk)
+    
     can_review = False
     has_reviewed = False
     
@@ -109,52 +189,78 @@ def product_detail(request, slug):
         can_review = has_purchased
         has_reviewed = Review.objects.filter(product=product, user=request.user).exists()
     
-    context = {
-        'product': product,
-        'reviews': reviews,
-        'related_products': related_products,
-        'form': form,
-        'can_review': can_review,
-        'has_reviewed': has_reviewed,
-    }
-    return render(request, 'products/product_detail.html', context)
+    seller_online = is_online(product.seller)
+    
+    # Страница не изменилась - отвечаем 304 без рендеринга
+    etag, last_modified = _product_detail_validators(request, product, can_review, has_reviewed, seller_online)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    
+    with query_budget(PRODUCT_DETAIL_QUERY_BUDGET, 'product_detail'):
+        context = {
+            'product': product,
+            'form': ReviewForm(),
+            'can_review': can_review,
+            'has_reviewed': has_reviewed,
+            'seller_online': seller_online,
+            **load_product_detail(request, product),
+        }
+        response = render(request, 'products/product_detail.html', context)
+    return set_validators(request, response, etag, last_modified)
+
+def product_detail(request, slug):
+    product = get_object_or_404(product_detail_queryset(), slug=slug, status='active')
+    return _render_product_detail(request, product)
 
 @login_required
+@require_POST
 def leave_view_time(request, product_id):
-    view_time_start = request.session.get(f'view_time_start_{product_id}')
-    if view_time_start:
-        view_time = int(time.time() - view_time_start)
-        user_activity, created = UserActivity.objects.get_or_create(user=request.user, product_id=product_id)
-        user_activity.view_time += view_time
-        user_activity.save()
-        del request.session[f'view_time_start_{product_id}']
+    # Время просмотра измеряется на странице и передается при уходе с нее
+    try:
+        seconds = int(request.POST.get('seconds', 0))
+    except ValueError:
+        seconds = 0
+    record_view_time(request.user.pk, product_id, seconds)
     return JsonResponse({'status': 'success'})
 
-@login_required
 @require_POST
 def add_to_cart(request):
+    # Без входа товар попадает в анонимную корзину (если она включена)
+    if not request.user.is_authenticated and not anonymous_carts_enabled():
+        return redirect_to_login(request.get_full_path())
+    
     product_id = request.POST.get('product_id')
     quantity = int(request.POST.get('quantity', 1))
+    if quantity < 1:
+        messages.error(request, 'Количество должно быть больше нуля')
+        return redirect('product_list')
     
     product = get_object_or_404(Product, id=product_id, status='active')
     
-    # Проверка доступности товара
-    if product.stock < quantity:
-        messages.error(request, f'Недостаточно товара в наличии. Доступно: {product.stock}')
+    # Проверка доступности товара с учетом резервов других покупателей
+    if product.flash_sale:
+        available = flash_available(product)
+    elif request.user.is_authenticated:
+        available = available_stock(product, request.user)
+    else:
+        available = product.available_stock
+    if available < quantity:
+        messages.error(request, f'Недостаточно товара в наличии. Доступно: {available}')
         return redirect('product_detail', slug=product.slug)
     
-    # Получение или создание корзины
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    
-    # Добавление в корзину
-    cart_item, item_created = CartItem.objects.get_or_create(cart=cart, product=product)
-    
-    if not item_created:
-        cart_item.quantity += quantity
+    # Атомарное добавление: количество в корзине не превысит доступный остаток
+    if request.user.is_authenticated:
+        added = add_item(request.user, product.id, quantity, available)
     else:
-        cart_item.quantity = quantity
+        added = add_anonymous_item(request, product.id, quantity, available)
+    if added is None:
+        messages.error(request, f'В корзине уже есть этот товар. Доступно всего: {available}')
+        return redirect('product_detail', slug=product.slug)
     
-    cart_item.save()
+    if not request.user.is_authenticated:
+        messages.success(request, 'Товар добавлен в корзину. Войдите, чтобы оформить заказ.')
+        return redirect_to_login(reverse('cart'))
     
     messages.success(request, 'Товар добавлен в корзину')
     return redirect('cart')
@@ -162,7 +268,15 @@ def add_to_cart(request):
 @login_required
 def cart(request):
     cart, created = Cart.objects.get_or_create(user=request.user)
-    context = {'cart': cart}
+    cart_items = list(cart.items.prefetch_related(
+        Prefetch('product', queryset=Product.objects.for_cards())
+    ).order_by('id'))
+    context = {
+        'cart': cart,
+        'cart_items': cart_items,
+        'cart_total': sum(item.subtotal for item in cart_items),
+        'cart_item_count': len(cart_items),
+    }
     return render(request, 'products/cart.html', context)
 
 @login_required
@@ -172,78 +286,39 @@ def update_cart(request):
     item_id = data.get('item_id')
     quantity = int(data.get('quantity'))
     
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart__user=request.user)
     
-    # Проверка доступности товара
-    if cart_item.product.stock < quantity:
+    # Проверка доступности товара с учетом резервов других покупателей
+    product = cart_item.product
+    available = flash_available(product) if product.flash_sale else available_stock(product, request.user)
+    if available < quantity:
         return JsonResponse({
             'status': 'error',
-            'message': f'Недостаточно товара в наличии. Доступно: {cart_item.product.stock}'
+            'message': f'Недостаточно товара в наличии. Доступно: {available}'
         })
     
     if quantity > 0:
-        cart_item.quantity = quantity
-        cart_item.save()
+        set_quantity(cart_item.pk, quantity)
     else:
         cart_item.delete()
+        release_reservations(request.user, [cart_item.product_id])
     
-    cart = Cart.objects.get(user=request.user)
-    
-    return JsonResponse({
-        'status': 'success',
-        'subtotal': str(cart_item.subtotal) if quantity > 0 else "0",
-        'total': str(cart.total_price),
-        'item_count': cart.item_count
-    })
+    # Подытог, сумма и количество позиций - одним запросом
+    return JsonResponse(summary_json(cart_summary(request.user, item_id=cart_item.pk)))
 
 @login_required
 @require_POST
 def remove_from_cart(request, item_id):
     cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
     cart_item.delete()
+    release_reservations(request.user, [cart_item.product_id])
     
     messages.success(request, 'Товар удалён из корзины')
     return redirect('cart')
 
 def product_detail_by_id(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    reviews = product.reviews.all().order_by('-created_at')
-    related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
-    
-    # Запись времени активности пользователя
-    if request.user.is_authenticated:
-        view_time_start = request.session.get(f'view_time_start_{product.id}')
-        if not view_time_start:
-            request.session[f'view_time_start_{product.id}'] = time.time()
-        
-        # Обновление счетчика просмотров и активности
-        user_activity, created = request.user.activities.get_or_create(product=product)
-        if not created:
-            user_activity.view_count += 1
-            user_activity.save()
-    
-    # Форма отзыва
-    form = ReviewForm()
-    can_review = False
-    has_reviewed = False
-    
-    if request.user.is_authenticated:
-        # Проверка, купил ли пользователь товар
-        has_purchased = request.user.orders.filter(
-            items__product=product, status='completed'
-        ).exists()
-        can_review = has_purchased
-        has_reviewed = Review.objects.filter(product=product, user=request.user).exists()
-    
-    context = {
-        'product': product,
-        'reviews': reviews,
-        'related_products': related_products,
-        'form': form,
-        'can_review': can_review,
-        'has_reviewed': has_reviewed,
-    }
-    return render(request, 'products/product_detail.html', context)
+    product = get_object_or_404(product_detail_queryset(), id=product_id)
+    return _render_product_detail(request, product)
 
 @login_required
 @require_POST
@@ -253,7 +328,7 @@ def add_to_wishlist(request):
     
     wishlist, created = Wishlist.objects.get_or_create(user=request.user)
     
-    if product in wishlist.products.all():
+    if product.id in get_membership(request)['wishlist']:
         wishlist.products.remove(product)
         added = False
         message = 'Товар удалён из списка желаний'
@@ -276,7 +351,7 @@ def add_to_wishlist(request):
 @login_required
 def wishlist(request):
     wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    context = {'wishlist': wishlist}
+    context = {'wishlist': wishlist, 'products': wishlist.products.for_cards()}
     return render(request, 'products/wishlist.html', context)
 
 @login_required
@@ -301,14 +376,16 @@ def submit_review(request, product_id):
     
     form = ReviewForm(request.POST)
     if form.is_valid():
-        review = form.save(commit=False)
-        review.user = request.user
-        review.product = product
-        review.save()
-        
-        # Сохранение изображений отзыва
-        for image in request.FILES.getlist('images'):
-            ReviewImage.objects.create(review=review, image=image)
+        # Отзыв и агрегаты рейтинга товара сохраняются в одной транзакции
+        with transaction.atomic():
+            review = form.save(commit=False)
+            review.user = request.user
+            review.product = product
+            review.save()
+            
+            # Сохранение изображений отзыва
+            for image in request.FILES.getlist('images'):
+                ReviewImage.objects.create(review=review, image=image)
         
         messages.success(request, 'Ваш отзыв добавлен')
     else:
@@ -360,41 +437,24 @@ class SellerDashboardView(LoginRequiredMixin, SellerDashboardMixin, TemplateView
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Получаем статистику продаж
         orders = self.request.user.seller_orders.all()
-        completed_orders = orders.filter(status='completed')
         
-        # Общая статистика
-        context['total_revenue'] = completed_orders.aggregate(
-            total=Sum('total_price'))['total'] or 0
-        context['total_orders'] = completed_orders.count()
+        # Общая статистика по дневной сводке продаж
+        context['total_revenue'], context['total_orders'] = completed_totals(self.request.user)
         context['total_products'] = self.request.user.products.filter(
             status='active').count()
         
         # Последние заказы
         context['recent_orders'] = orders.order_by('-created_at')[:5]
         
-        # Популярные товары
-        context['popular_products'] = self.request.user.products.annotate(
-            order_count=Count('order_items')).order_by('-order_count')[:3]
+        # Популярные товары за последние 30 дней
+        context['popular_products'] = top_products(self.request.user, days=30, limit=3)
         
         # Данные для графика продаж (последние 7 дней)
-        from django.utils import timezone
-        import json
-        from datetime import timedelta
-        
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=7)
-        
-        # Заглушка для данных графика
-        labels = [(start_date + timedelta(days=i)).strftime('%d.%m') 
-                 for i in range(7)]
-        # В реальном проекте здесь будет агрегация по датам
-        values = [0] * 7  # Заполните реальными данными при необходимости
-        
+        sales = daily_revenue(self.request.user, days=7)
         context['sales_data'] = json.dumps({
-            'labels': labels,
-            'values': values
+            'labels': [day.strftime('%d.%m') for day, _ in sales],
+            'values': [float(total) for _, total in sales]
         })
         
         return context
@@ -423,37 +483,68 @@ def seller_generate_description(request):
             }, status=429)  # 429 Too Many Requests
         return JsonResponse({'status': 'error', 'message': error_msg})
     
-class SellerProductsView(LoginRequiredMixin, SellerDashboardMixin, ListView):
+@login_required
+@require_POST
+def seller_bulk_update_products(request):
+    """
+    Массовое обновление цен и остатков товаров продавца.
+    Тело: {"rows": [{"id": 1, "price": "990.00", "old_price": null, "stock": 5, "status": "active"}, ...]},
+    в строке передаются только изменяемые поля; в ответе - результат по каждой строке.
+    """
+    if not request.user.is_seller():
+        return JsonResponse({'status': 'error', 'message': 'У вас нет доступа к этой функции'}, status=403)
+
+    try:
+        rows = json.loads(request.body).get('rows')
+    except (ValueError, AttributeError):
+        rows = None
+    if not isinstance(rows, list):
+        return JsonResponse({'status': 'error', 'message': 'Ожидается список строк rows'}, status=400)
+    if len(rows) > MAX_BULK_ROWS:
+        return JsonResponse({'status': 'error', 'message': f'Не более {MAX_BULK_ROWS} строк за запрос'}, status=400)
+
+    results = bulk_update_products(rows, seller=request.user)
+    return JsonResponse({
+        'status': 'success',
+        'updated': sum(1 for result in results if result['result'] == 'updated'),
+        'results': results,
+    })
+    
+class SellerProductsView(LoginRequiredMixin, SellerDashboardMixin, CursorPaginationMixin, ListView):
     template_name = 'products/seller_product_list.html'
     context_object_name = 'products'
     paginate_by = 10
     
+    def get_cursor_ordering(self):
+        if self.request.GET.get('search'):
+            return ('-rank', '-id')
+        return ('-created_at', '-id')
+    
     def get_queryset(self):
-        queryset = self.request.user.products.all()
+        queryset = self.request.user.products.for_cards()
         
-        # Фильтрация по запросу
+        # Полнотекстовый поиск
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) | 
-                Q(description__icontains=search_query)
-            )
+            queryset = search_products(queryset, search_query)
         
-        # Фильтрация по категории
+        # Фильтрация по категории (включая подкатегории)
         category_id = self.request.GET.get('category')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
+        if category_id and category_id.isdigit():
+            category = get_category_tree().get(int(category_id))
+            category_ids = category.descendant_ids if category else [int(category_id)]
+            queryset = queryset.filter(category_id__in=category_ids)
         
         # Фильтрация по статусу
         status = self.request.GET.get('status')
         if status:
             queryset = queryset.filter(status=status)
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by(*self.get_cursor_ordering())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = list(get_category_tree())
         return context
     
 class SellerProductCreateView(LoginRequiredMixin, SellerDashboardMixin, CreateView):
@@ -463,7 +554,7 @@ class SellerProductCreateView(LoginRequiredMixin, SellerDashboardMixin, CreateVi
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = list(get_category_tree())
         return context
     
     def form_valid(self, form):
@@ -513,7 +604,7 @@ class SellerProductUpdateView(LoginRequiredMixin, SellerDashboardMixin, UpdateVi
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = list(get_category_tree())
         
         if self.request.POST:
             context['attribute_formset'] = ProductAttributeFormSet(
@@ -574,7 +665,7 @@ class SellerProductDeleteView(LoginRequiredMixin, SellerDashboardMixin, DeleteVi
         messages.success(request, 'Товар успешно удален')
         return HttpResponseRedirect(success_url)
 
-class SellerOrdersView(LoginRequiredMixin, SellerDashboardMixin, ListView):
+class SellerOrdersView(LoginRequiredMixin, SellerDashboardMixin, CursorPaginationMixin, ListView):
     template_name = 'orders/seller_orders.html'
     context_object_name = 'orders'
     paginate_by = 10
@@ -587,7 +678,17 @@ class SellerOrdersView(LoginRequiredMixin, SellerDashboardMixin, ListView):
         if status:
             queryset = queryset.filter(status=status)
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
+
+class SellerOrdersExportView(SellerOrdersView):
+    """Потоковая выгрузка заказов продавца с позициями (CSV или JSON Lines) с фильтрами списка"""
+    
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+        filename = f'orders_{timezone.localdate():%Y%m%d}'
+        return export_response(self.get_queryset(), export_format, filename)
 
 class SellerOrderDetailView(LoginRequiredMixin, SellerDashboardMixin, DetailView):
     model = Order
@@ -600,6 +701,9 @@ class SellerOrderDetailView(LoginRequiredMixin, SellerDashboardMixin, DetailView
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['status_updates'] = self.object.status_updates.all().order_by('created_at')
+        context['order_items'] = self.object.items.prefetch_related(
+            Prefetch('product', queryset=Product.objects.for_cards())
+        )
         return context
 
 class SellerOrderUpdateStatusView(LoginRequiredMixin, SellerDashboardMixin, UpdateView):
@@ -611,21 +715,24 @@ class SellerOrderUpdateStatusView(LoginRequiredMixin, SellerDashboardMixin, Upda
         return self.request.user.seller_orders.all()
     
     def form_valid(self, form):
-        # Сохраняем предыдущий статус
-        old_status = self.get_object().status
-        
-        # Сохраняем новый статус
-        self.object = form.save()
-        
-        # Если статус изменился, создаем запись об изменении статуса
-        if old_status != self.object.status:
-            comment = self.request.POST.get('comment', '')
-            OrderStatus.objects.create(
-                order=self.object,
-                status=self.object.status,
-                comment=comment,
-                created_by=self.request.user
-            )
+        with transaction.atomic():
+            # Предыдущий статус читаем под блокировкой строки: параллельная смена
+            # статуса не применит отмену к счетчикам дважды
+            old_status = self.get_queryset().select_for_update().values_list('status', flat=True).get(pk=self.object.pk)
+
+            # Сохраняем новый статус
+            self.object = form.save()
+            
+            # Если статус изменился, создаем запись об изменении статуса
+            if old_status != self.object.status:
+                comment = self.request.POST.get('comment', '')
+                OrderStatus.objects.create(
+                    order=self.object,
+                    status=self.object.status,
+                    comment=comment,
+                    created_by=self.request.user
+                )
+                record_order_status_change(self.object, old_status, self.object.status)
         
         messages.success(self.request, 'Статус заказа успешно обновлен')
         return redirect('seller_order_detail', pk=self.object.pk)
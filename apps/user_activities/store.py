@@ -0,0 +1,152 @@
+import threading
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+# Вес одного просмотра в профиле интересов (в секундах просмотра)
+VIEW_SCORE = 30
+# Профиль интересов хранится, пока пользователь смотрит товары
+INTEREST_TTL = 30 * 24 * 60 * 60
+INTEREST_MAX_PRODUCTS = 200
+
+DIRTY_USERS_KEY = 'activity:dirty'
+
+
+def _pending_key(user_id):
+    return f'activity:pending:{user_id}'
+
+
+def _interest_key(user_id):
+    return f'activity:interest:{user_id}'
+
+
+def _parse_pending(values):
+    """Поля хеша "<product_id>:v" / "<product_id>:t" -> {product_id: [просмотры, секунды]}"""
+    counters = defaultdict(lambda: [0, 0])
+    for field, value in values.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        product_id, kind = field.split(':')
+        counters[int(product_id)][0 if kind == 'v' else 1] += int(value)
+    return counters
+
+
+class RedisCounterStore:
+    """Счетчики просмотров в Redis: хеш накопленных изменений и профиль интересов на пользователя"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _increment(self, user_id, product_id, kind, amount, score):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(_pending_key(user_id), f'{product_id}:{kind}', amount)
+        pipe.sadd(DIRTY_USERS_KEY, user_id)
+        pipe.zincrby(_interest_key(user_id), score, product_id)
+        pipe.zremrangebyrank(_interest_key(user_id), 0, -INTEREST_MAX_PRODUCTS - 1)
+        pipe.expire(_interest_key(user_id), INTEREST_TTL)
+        pipe.execute()
+
+    def record_view(self, user_id, product_id):
+        self._increment(user_id, product_id, 'v', 1, VIEW_SCORE)
+
+    def record_view_time(self, user_id, product_id, seconds):
+        self._increment(user_id, product_id, 't', seconds, seconds)
+
+    def drain(self, batch_size):
+        """Забирает накопленные счетчики пачки пользователей: [(user_id, product_id, просмотры, секунды)]"""
+        user_ids = self.client.spop(DIRTY_USERS_KEY, batch_size) or []
+        rows = []
+        for user_id in user_ids:
+            user_id = int(user_id)
+            # HGETALL и DEL в одной транзакции - новые просмотры попадут в следующий сброс
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hgetall(_pending_key(user_id))
+            pipe.delete(_pending_key(user_id))
+            values, _ = pipe.execute()
+            for product_id, (views, seconds) in _parse_pending(values).items():
+                rows.append((user_id, product_id, views, seconds))
+        return rows
+
+    def restore(self, rows):
+        """Возврат счетчиков, которые не удалось записать в базу"""
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, product_id, views, seconds in rows:
+            if views:
+                pipe.hincrby(_pending_key(user_id), f'{product_id}:v', views)
+            if seconds:
+                pipe.hincrby(_pending_key(user_id), f'{product_id}:t', seconds)
+            pipe.sadd(DIRTY_USERS_KEY, user_id)
+        pipe.execute()
+
+    def top_products(self, user_id, limit):
+        return [int(product_id) for product_id in self.client.zrevrange(_interest_key(user_id), 0, limit - 1)]
+
+
+class LocalCounterStore:
+    """
+    Замена Redis в памяти процесса (разработка без Redis).
+    Сбрасывается только задачей, выполняемой в том же процессе (например, CELERY_TASK_ALWAYS_EAGER).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        self.interest = defaultdict(lambda: defaultdict(int))
+
+    def _increment(self, user_id, product_id, index, amount, score):
+        with self.lock:
+            self.pending[user_id][product_id][index] += amount
+            self.interest[user_id][product_id] += score
+
+    def record_view(self, user_id, product_id):
+        self._increment(user_id, product_id, 0, 1, VIEW_SCORE)
+
+    def record_view_time(self, user_id, product_id, seconds):
+        self._increment(user_id, product_id, 1, seconds, seconds)
+
+    def drain(self, batch_size):
+        with self.lock:
+            user_ids = list(self.pending)[:batch_size]
+            return [
+                (user_id, product_id, views, seconds)
+                for user_id in user_ids
+                for product_id, (views, seconds) in self.pending.pop(user_id).items()
+            ]
+
+    def restore(self, rows):
+        with self.lock:
+            for user_id, product_id, views, seconds in rows:
+                self.pending[user_id][product_id][0] += views
+                self.pending[user_id][product_id][1] += seconds
+
+    def top_products(self, user_id, limit):
+        with self.lock:
+            scores = self.interest.get(user_id, {})
+            return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Клиент быстрого хранилища (Redis) или None, если FAST_STORE_URL не задан"""
+    url = settings.FAST_STORE_URL
+    if not url:
+        return None
+    with _lock:
+        if url not in _clients:
+            _clients[url] = redis.Redis.from_url(url)
+        return _clients[url]
+
+
+_stores = {}
+
+
+def get_counter_store():
+    client = get_redis_client()
+    key = 'redis' if client is not None else 'local'
+    with _lock:
+        if key not in _stores:
+            _stores[key] = RedisCounterStore(client) if client is not None else LocalCounterStore()
+        return _stores[key]
@@ -0,0 +1,7 @@
+from celery import shared_task
+
+@shared_task
+def flush_user_activity():
+    """Перенос накопленных просмотров товаров из быстрого хранилища в базу"""
+    from .tracking import flush_activity
+    return flush_activity()
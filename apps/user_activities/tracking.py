@@ -0,0 +1,90 @@
+import logging
+
+import redis
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+from .models import UserActivity
+from apps.products.models import Product
+from .store import get_counter_store
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Максимальное время одного просмотра (вкладку могли оставить открытой)
+MAX_VIEW_TIME = 30 * 60
+FLUSH_BATCH_SIZE = 500
+
+
+def record_product_view(user_id, product_id):
+    """
+    Просмотр товара - только инкремент в быстром хранилище, без записи в базу в запросе.
+    Недоступность Redis не ломает страницу: просмотр не учитывается.
+    """
+    try:
+        get_counter_store().record_view(user_id, product_id)
+    except redis.RedisError:
+        logger.warning('Не удалось учесть просмотр товара #%s', product_id, exc_info=True)
+
+
+def record_view_time(user_id, product_id, seconds):
+    seconds = min(max(int(seconds), 0), MAX_VIEW_TIME)
+    if not seconds:
+        return
+    try:
+        get_counter_store().record_view_time(user_id, product_id, seconds)
+    except redis.RedisError:
+        logger.warning('Не удалось учесть время просмотра товара #%s', product_id, exc_info=True)
+
+
+def _upsert_activity(rows):
+    """Пакетный INSERT ... ON CONFLICT с прибавлением накопленных счетчиков"""
+    # JOIN отбрасывает счетчики удаленных за это время товаров и пользователей
+    sql = f"""
+        INSERT INTO {UserActivity._meta.db_table} AS activity (user_id, product_id, view_count, view_time, last_viewed)
+        SELECT data.user_id, data.product_id, data.view_count, data.view_time, NOW()
+        FROM (VALUES %s) AS data (user_id, product_id, view_count, view_time)
+        JOIN {Product._meta.db_table} product ON product.id = data.product_id
+        JOIN {User._meta.db_table} account ON account.id = data.user_id
+        ON CONFLICT (user_id, product_id) DO UPDATE SET
+            view_count = activity.view_count + EXCLUDED.view_count,
+            view_time = activity.view_time + EXCLUDED.view_time,
+            last_viewed = EXCLUDED.last_viewed
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        execute_values(cursor.cursor, sql, rows, page_size=FLUSH_BATCH_SIZE)
+
+
+def flush_activity(batch_size=FLUSH_BATCH_SIZE):
+    """Перенос накопленных просмотров и времени просмотра в UserActivity пакетами"""
+    store = get_counter_store()
+    flushed = 0
+    while True:
+        rows = store.drain(batch_size)
+        if not rows:
+            return flushed
+        try:
+            _upsert_activity(rows)
+        except Exception:
+            # Счетчики не теряем - вернутся в хранилище до следующего запуска
+            store.restore(rows)
+            logger.exception('Не удалось сохранить активность пользователей')
+            raise
+        flushed += len(rows)
+
+
+def get_interest_product_ids(user_id, limit=10):
+    """
+    Товары, которые больше всего интересуют пользователя: из профиля в быстром хранилище,
+    а если он пуст (например, после очистки Redis) - из сохраненной активности.
+    """
+    product_ids = get_counter_store().top_products(user_id, limit)
+    if product_ids:
+        return product_ids
+    return list(
+        UserActivity.objects.filter(user_id=user_id).order_by(
+            '-view_time', '-view_count'
+        ).values_list('product_id', flat=True)[:limit]
+    )
@@ -25,10 +25,50 @@ app.conf.beat_schedule = {
         'task': 'apps.products.tasks.notify_low_stock_products',
         'schedule': crontab(hour=9, minute=0),
     },
-    # Обновление статуса "в сети" каждые 10 минут
+    # Пересборка словаря поиска каждый день в 3:00
+    'rebuild-search-vocabulary-daily': {
+        'task': 'apps.products.tasks.rebuild_search_vocabulary',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # Пересборка снимка каталога каждые 5 минут
+    'rebuild-catalog-snapshot': {
+        'task': 'apps.products.tasks.rebuild_catalog_snapshot',
+        'schedule': crontab(minute='*/5'),
+    },
+    # Пересчет скользящих окон продаж каждый час
+    'refresh-sales-windows-hourly': {
+        'task': 'apps.products.tasks.refresh_sales_windows',
+        'schedule': crontab(minute=15),
+    },
+    # Перенос накопленных просмотров товаров в базу каждую минуту
+    'flush-user-activity': {
+        'task': 'apps.user_activities.tasks.flush_user_activity',
+        'schedule': crontab(),
+    },
+    # Синхронизация статуса "в сети" с быстрым хранилищем каждую минуту
     'update-online-status': {
         'task': 'apps.accounts.tasks.update_online_status',
-        'schedule': crontab(minute='*/10'),
+        'schedule': crontab(minute='*'),
+    },
+    # Снятие просроченных резервов товаров каждую минуту
+    'expire-stock-reservations': {
+        'task': 'apps.orders.tasks.expire_stock_reservations',
+        'schedule': crontab(),
+    },
+    # Сохранение заказов распродажи и сверка счетчиков остатков каждую минуту
+    'process-flash-orders': {
+        'task': 'apps.orders.tasks.process_flash_orders',
+        'schedule': crontab(),
+    },
+    # Рассылка событий outbox (повторные попытки и пропущенные запуски) каждую минуту
+    'dispatch-outbox-events': {
+        'task': 'apps.notifications.tasks.dispatch_outbox_events',
+        'schedule': crontab(),
+    },
+    # Очистка обработанных событий outbox каждый день в 4:00
+    'purge-outbox-events-daily': {
+        'task': 'apps.notifications.tasks.purge_outbox_events',
+        'schedule': crontab(hour=4, minute=0),
     },
 }
 
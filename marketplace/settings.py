@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -68,8 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'apps.products.context_processors.cart_items_count',
-                'apps.products.context_processors.wishlist_items_count',
+                'apps.accounts.context_processors.header_summary',
             ],
         },
     },
@@ -102,6 +102,18 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Кэш (общий для всех процессов, используется для пользовательских данных и разделов страниц)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://redis:6379/1'),
+        'KEY_PREFIX': 'marketplace',
+    },
+}
+
+# Быстрое хранилище счетчиков (Redis); пустое значение - хранилище в памяти процесса
+FAST_STORE_URL = config('FAST_STORE_URL', default='redis://redis:6379/2')
+
 DAPHNE_HOST = '0.0.0.0'
 DAPHNE_PORT = 8000
 
@@ -147,6 +159,19 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Проверка бюджета SQL-запросов страниц (assert), по умолчанию - в режиме отладки
+QUERY_BUDGET_ENFORCED = config('QUERY_BUDGET_ENFORCED', default=DEBUG, cast=bool)
+
+# Время резерва товаров при оформлении заказа (секунды)
+STOCK_RESERVATION_TTL = config('STOCK_RESERVATION_TTL', default=15 * 60, cast=int)
+
+# Корзина для неавторизованных пользователей (в кэше, переносится в корзину при входе)
+ANONYMOUS_CART_ENABLED = config('ANONYMOUS_CART_ENABLED', default=False, cast=bool)
+
+# Колоночный снимок каталога (общий для всех воркеров через mmap)
+CATALOG_SNAPSHOT_ENABLED = config('CATALOG_SNAPSHOT_ENABLED', default=True, cast=bool)
+CATALOG_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'var', 'catalog_snapshot')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -197,6 +222,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Поток событий outbox для аналитики
+        'marketplace.analytics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
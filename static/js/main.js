@@ -75,22 +75,6 @@ document.addEventListener('DOMContentLoaded', function() {
         return cookieValue;
     }
     
-    // Обработчик для отслеживания времени просмотра товара
-    const productDetailPage = document.querySelector('.product-detail-page');
-    if (productDetailPage) {
-        const productId = productDetailPage.dataset.productId;
-        
-        // При закрытии страницы отправляем время просмотра
-        window.addEventListener('beforeunload', function() {
-            fetch(`/leave-view-time/${productId}/`, {
-                method: 'POST',
-                headers: {
-                    'X-CSRFToken': getCookie('csrftoken')
-                }
-            });
-        });
-    }
-    
     // Добавление в список желаний
     const wishlistButtons = document.querySelectorAll('.wishlist-button');
     if (wishlistButtons) {